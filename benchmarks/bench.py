@@ -0,0 +1,660 @@
+"""Offline load tests for bot.py.
+
+Runs scripted scenarios against the fakes in fake_discord.py on an event loop with virtual time
+(hours of boost countdowns finish in seconds), then reports REST calls per route, 429s, event-loop
+lag, and time and memory per approval. Results are compared with baseline.json and the run fails
+when a metric regresses past its tolerance or a scenario's correctness check fails.
+
+    python benchmarks/bench.py                    # run all scenarios, compare with the baseline
+    python benchmarks/bench.py boosts_500         # run one scenario
+    python benchmarks/bench.py --update-baseline  # store the current results as the new baseline
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
+import random
+import selectors
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fake_discord import FakeClient, FakeContext, FakeInteraction  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+BOT_PATH = os.path.join(os.path.dirname(HERE), "bot.py")
+EPOCH = 1_700_000_000.0  # virtual time 0 as a unix timestamp
+
+# Metrics compared against the baseline (all lower-is-better) -> (relative, absolute) tolerance.
+# REST counts are deterministic and tight; timings and memory depend on the machine.
+TOLERANCES = {
+    "rest_calls": (0.10, 5),
+    "rest_calls_per_second": (0.10, 0.5),
+    "peak_calls_per_second": (0.25, 2),
+    "rate_limited": (0.25, 5),
+    "loop_lag_p99_ms": (1.0, 5.0),
+    "approval_ms_mean": (1.0, 2.0),
+    "approval_bytes": (0.5, 2048),
+    "ticket_ms_mean": (1.0, 2.0),
+    "bulk_close_seconds": (0.25, 2.0),
+    "reconcile_ms": (1.0, 5.0),
+    "expiry_drain_seconds": (0.25, 2.0),
+    "open_seconds_max": (0.25, 0.5),
+    "expiry_notices": (0.0, 0),
+}
+
+
+# --- Virtual time ---
+class VirtualSelector(selectors.BaseSelector):
+    # Wraps the real selector. Instead of blocking until the next timer, select() moves the virtual
+    # clock forward, so sleeps cost no wall time. The real time between two select() calls is how
+    # long one loop iteration ran callbacks, which is the lag any other callback could have seen.
+    def __init__(self):
+        self._real = selectors.DefaultSelector()
+        self.clock = 0.0
+        self.iteration_seconds = []
+        self._returned_at = None
+
+    def register(self, fileobj, events, data=None):
+        return self._real.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._real.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._real.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._real.get_map()
+
+    def close(self):
+        self._real.close()
+
+    def select(self, timeout=None):
+        if self._returned_at is not None:
+            self.iteration_seconds.append(time.perf_counter() - self._returned_at)
+        events = self._real.select(0)
+        if not events:
+            if timeout is None:
+                # Nothing scheduled: only a worker thread (the state store) can wake us up
+                events = self._real.select(0.05)
+            elif timeout > 0:
+                self.clock += timeout
+        self._returned_at = time.perf_counter()
+        return events
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        self.virtual_selector = VirtualSelector()
+        super().__init__(self.virtual_selector)
+
+    def time(self):
+        return self.virtual_selector.clock
+
+
+# --- Harness ---
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Harness:
+    def __init__(self, loop, latency=0.05, mode="standalone"):
+        self.loop = loop
+        self.client = FakeClient(latency)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.worker = None
+        self.worker_server = None
+        os.environ.pop("DISCORD_BOT_TOKEN", None)
+        os.environ["BOT_MODE"] = mode
+        os.environ["BOT_STATE_DB"] = os.path.join(self.tmp.name, "state.sqlite3")
+        os.environ["BOT_IPC_PATH"] = os.path.join(self.tmp.name, "scheduler.sock")
+        self._load_bot()
+        self.client.rest.on_rate_limit = self._note_rate_limit
+        self.guild = self.client.create_guild()
+        self.mod_role = self.guild.create_role(self.bot.TRIAL_MOD_ROLE_NAME)
+        self.guild.add_text_channel(self.bot.BOOSTS_CHANNEL_NAME)
+        self.ticket_ms = []
+        self.approval_ms = []
+
+    def _load_bot(self):
+        # A fresh module per scenario (and per restart): bot.py keeps its state in module globals
+        if "bot" in sys.modules:
+            self.bot = importlib.reload(sys.modules["bot"])
+        else:
+            self.bot = importlib.import_module("bot")
+        self.bot.now = lambda: EPOCH + self.loop.time()
+        self.bot.bot.get_guild = self.client.get_guild
+        self.bot.bot.get_channel = self.client.get_channel
+        self.bot.bot.get_user = self.client.get_user
+        self.client.handlers.clear()
+        for event in ("guild_channel_create", "guild_channel_delete", "raw_message_delete"):
+            self.client.on(event, getattr(self.bot, f"on_{event}"))
+
+    async def restart(self):
+        # Stops every timer and worker of the running bot, keeps its state database and starts a
+        # new copy of bot.py against the same (fake) Discord
+        await self.bot.state_store.flush()
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.bot.state_store.close()
+        self._load_bot()
+        await self.start()
+
+    def close(self):
+        self.tmp.cleanup()
+
+    def _note_rate_limit(self, route, major_id, limited, retry_after):
+        # Message routes are limited per channel, which is what bot.py's http_trace hook records
+        if route.startswith("message."):
+            for module in (self.bot, self.worker):
+                if module is not None:
+                    module.note_rate_limit(major_id, limited, retry_after)
+
+    async def start_scheduler_worker(self):
+        # A second, separate copy of bot.py in BOT_MODE=scheduler with its own state database,
+        # listening on a real Unix socket for the shard (self.bot) to connect to
+        os.environ["BOT_MODE"] = "scheduler"
+        os.environ["BOT_STATE_DB"] = os.path.join(self.tmp.name, "worker.sqlite3")
+        spec = importlib.util.spec_from_file_location("bot_scheduler_worker", BOT_PATH)
+        worker = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(worker)
+        worker.now = self.bot.now
+        # The worker has no gateway cache; it reaches channels by ID over REST
+        worker.bot.get_partial_messageable = self.client.get_partial_messageable
+        worker.bot.http = self.client.http
+        await worker.restore_state()
+        self.worker_server = await asyncio.start_unix_server(worker.serve_shard, worker.BOT_IPC_PATH)
+        self.worker = worker
+        return worker
+
+    async def stop_scheduler_worker(self):
+        # Hang up the shard's end first, so the worker's connection handler ends on EOF instead of
+        # being cancelled mid-read
+        self.worker_server.close()
+        self.bot.scheduler_link._task.cancel()
+        await asyncio.sleep(1)
+
+    def add_members(self, count, moderators=False):
+        roles = [self.mod_role] if moderators else []
+        prefix = "mod" if moderators else "user"
+        return [self.guild.add_member(f"{prefix}{i}", roles=roles) for i in range(count)]
+
+    async def create_ticket(self, moderator, discord_username, hours, submits=1):
+        # !createticket followed by the opener filling in the intake form (`submits` times at once,
+        # like a double click on Submit)
+        started = time.perf_counter()
+        before = set(self.guild.channels)
+        ctx = FakeContext(self.guild, moderator, self.guild.text_channels[0])
+        await self.bot.createticket.callback(ctx)
+        channel = next(
+            c for c in (self.guild.get_channel(i) for i in set(self.guild.channels) - before)
+            if c is not None and c.name.startswith("ps") and "-ticket-" in c.name
+            and any(isinstance(m.view, self.bot.TicketIntakeView) and m.view.opener == moderator for m in c.messages.values())
+        )
+        intake = channel.messages_with_view(self.bot.TicketIntakeView)[0]
+        modals = []
+        for _ in range(submits):
+            modal = self.bot.TicketIntakeModal(channel, intake.view.server_number, intake.view)
+            modal.discord_username._value = discord_username
+            modal.ingame_username._value = f"ign_{discord_username}"
+            modal.hours_left._value = str(hours)
+            modals.append(modal)
+        await asyncio.gather(*(modal.on_submit(FakeInteraction(self.guild, moderator, intake)) for modal in modals))
+        self.ticket_ms.append((time.perf_counter() - started) * 1000)
+        return channel
+
+    async def press(self, channel, button, moderator):
+        summary = channel.messages_with_view(self.bot.TicketView)[0]
+        interaction = FakeInteraction(self.guild, moderator, summary)
+        if await summary.view.interaction_check(interaction):
+            started = time.perf_counter()
+            await getattr(summary.view, button).callback(interaction)
+            if button == "approve":
+                self.approval_ms.append((time.perf_counter() - started) * 1000)
+        return interaction
+
+    async def start(self):
+        # What on_ready does before the bot takes commands
+        await self.bot.restore_state()
+        await self.bot.reconcile_guilds([self.guild])
+
+    async def settle(self, seconds):
+        await asyncio.sleep(seconds)
+
+    def report(self, duration):
+        rest = self.client.rest
+        lag = [s * 1000 for s in self.loop.virtual_selector.iteration_seconds]
+        routes = {
+            route: {
+                "calls": calls,
+                "per_second": round(calls / duration, 3),
+                "peak_per_second": rest.peak_per_second(route),
+                "rate_limited": rest.rate_limited[route],
+            }
+            for route, calls in sorted(rest.calls.items())
+        }
+        metrics = {
+            "virtual_seconds": round(duration, 1),
+            "rest_calls": rest.total(),
+            "rest_calls_per_second": round(rest.total() / duration, 3),
+            "peak_calls_per_second": max((r["peak_per_second"] for r in routes.values()), default=0),
+            "rate_limited": sum(rest.rate_limited.values()),
+            "loop_lag_p50_ms": round(percentile(lag, 50), 3),
+            "loop_lag_p95_ms": round(percentile(lag, 95), 3),
+            "loop_lag_p99_ms": round(percentile(lag, 99), 3),
+            "loop_lag_max_ms": round(max(lag, default=0.0), 3),
+        }
+        if self.ticket_ms:
+            metrics["ticket_ms_mean"] = round(sum(self.ticket_ms) / len(self.ticket_ms), 3)
+        if self.approval_ms:
+            metrics["approval_ms_mean"] = round(sum(self.approval_ms) / len(self.approval_ms), 3)
+            metrics["approval_ms_p95"] = round(percentile(self.approval_ms, 95), 3)
+        return metrics, routes
+
+
+# --- Scenarios ---
+# Each scenario returns a list of correctness failures (empty when everything checked out).
+async def scenario_createticket_burst(h, report):
+    # 50 moderators run !createticket at the same moment; every fifth opener submits the form twice
+    moderators = h.add_members(50, moderators=True)
+    channels = await asyncio.gather(*(
+        h.create_ticket(mod, f"user{i}", 1, submits=2 if i % 5 == 0 else 1) for i, mod in enumerate(moderators)
+    ))
+    await h.settle(5)
+    failures = []
+    names = [c.name for c in h.guild.text_channels if "-ticket-" in c.name]
+    if len(names) != 50 or len(set(names)) != 50:
+        failures.append(f"expected 50 distinct ticket channels, got {len(set(names))} of {len(names)}")
+    doubled = [c.name for c in channels if len(c.messages_with_view(h.bot.TicketView)) != 1]
+    if doubled:
+        failures.append(f"{len(doubled)} ticket(s) without exactly one summary: {doubled[:5]}")
+    categories = [c.name for c in h.guild.categories]
+    if len(categories) != len(set(categories)):
+        failures.append(f"duplicate categories created: {sorted(categories)}")
+    return failures
+
+
+async def scenario_gateway_lag_burst(h, report):
+    # 25 moderators run !createticket while gateway events trail the REST responses by 2 seconds:
+    # the bot must not rely on the channel create events to see the categories it just created
+    h.client.gateway_delay = 2.0
+    moderators = h.add_members(25, moderators=True)
+    await asyncio.gather(*(h.create_ticket(mod, f"user{i}", 1) for i, mod in enumerate(moderators)))
+    await h.settle(5)
+    failures = []
+    categories = sorted(c.name for c in h.guild.categories)
+    if categories != ["ps1", "ps2"]:
+        failures.append(f"expected one ps1 and one ps2 category, got {categories}")
+    names = [c.name for c in h.guild.text_channels if "-ticket-" in c.name]
+    if len(names) != 25 or len(set(names)) != 25:
+        failures.append(f"expected 25 distinct ticket channels, got {len(set(names))} of {len(names)}")
+    return failures
+
+
+async def scenario_boosts_500(h, report):
+    # 500 approved boosts of 1-4 hours running at once on one guild, until every one has expired
+    rng = random.Random(500)
+    moderators = h.add_members(25, moderators=True)
+    h.add_members(500)
+    channels = []
+    for start in range(0, 500, 50):
+        batch = range(start, start + 50)
+        channels += await asyncio.gather(*(h.create_ticket(moderators[i % 25], f"user{i}", rng.randint(1, 4)) for i in batch))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for start in range(0, 500, 50):
+        await asyncio.gather(*(h.press(c, "approve", moderators[0]) for c in channels[start:start + 50]))
+    # Let the queued writes and sends drain, so only what the bot keeps per boost is counted
+    await h.settle(30)
+    report["approval_bytes"] = (tracemalloc.get_traced_memory()[0] - before) // 500
+    tracemalloc.stop()
+    # Boosts of the same length expire together; channel deletes drain at about one per second
+    await h.settle(4 * 3600 + 600)
+    failures = []
+    if len(h.bot.boosts_queue):
+        failures.append(f"{len(h.bot.boosts_queue)} boost(s) still queued after every deadline passed")
+    left = [c.name for c in h.guild.text_channels if "-ticket-" in c.name]
+    if left:
+        failures.append(f"{len(left)} ticket channel(s) left after expiry")
+    # Route buckets of the 500 deleted ticket channels must not pile up in the dispatcher
+    buckets = len(h.bot.outbound._buckets)
+    if buckets > 50:
+        failures.append(f"{buckets} route bucket(s) still kept after every ticket channel was deleted")
+    return failures
+
+
+async def scenario_expiry_burst_100(h, report):
+    # 100 one-hour boosts approved in one go expire in the same second. One ticket channel's delete
+    # fails twice before it goes through, another one's never does and has to be dead-lettered.
+    moderators = h.add_members(25, moderators=True)
+    h.add_members(100)
+    channels = []
+    for start in range(0, 100, 50):
+        channels += await asyncio.gather(*(h.create_ticket(moderators[i % 25], f"user{i}", 1) for i in range(start, start + 50)))
+    await asyncio.gather(*(h.press(c, "approve", moderators[0]) for c in channels))
+    flaky, broken = channels[0], channels[1]
+    h.client.failing_deletes[flaky.id] = 2
+    h.client.failing_deletes[broken.id] = 100
+    boosts_channel = h.guild.text_channels[0]
+    await h.settle(3600)
+    started = h.loop.time()
+    while h.bot.expiry_pipeline.pending() or len(h.bot.boosts_queue):
+        if h.loop.time() - started > 900:
+            break
+        await h.settle(1)
+    report["expiry_drain_seconds"] = round(h.loop.time() - started, 1)
+    report["expiry_notices"] = sum("expired" in (m.content or "") for m in boosts_channel.messages.values())
+    await h.bot.state_store.flush()
+    failures = []
+    if len(h.bot.boosts_queue):
+        failures.append(f"{len(h.bot.boosts_queue)} boost(s) still queued after every deadline passed")
+    left = [c for c in h.guild.text_channels if "-ticket-" in c.name]
+    if left != [broken]:
+        failures.append(f"expected only the broken ticket channel to be left, got {[c.name for c in left]}")
+    dead = h.bot.state_store.load()["dead_letters"]
+    if dead != [(broken.id, h.guild.id)]:
+        failures.append(f"expected the broken ticket channel in the dead-letter log, got {dead}")
+    return failures
+
+
+async def scenario_warm_pool_rush(h, report):
+    # With 10 warm channels, a rush of 10 tickets is served by claiming them; closing the tickets
+    # puts their channels back into the pool instead of deleting them
+    h.bot.warm_pool = h.bot.WarmPool(10)
+    h.bot.warm_pool.refill_soon(h.guild)
+    await h.settle(30)
+    moderators = h.add_members(10, moderators=True)
+    warm = {c for c in h.guild.text_channels if "-ticket-" in c.name}
+    started = h.loop.time()
+    opened = []
+
+    async def open_ticket(moderator):
+        channel, _ = await h.bot.open_ticket_channel(h.guild, moderator)
+        opened.append((h.loop.time() - started, channel, moderator))
+
+    await asyncio.gather(*(open_ticket(mod) for mod in moderators))
+    report["open_seconds_max"] = round(max(seconds for seconds, _, _ in opened), 3)
+    failures = []
+    if len(warm) != 10 or any(channel not in warm for _, channel, _ in opened):
+        failures.append("tickets didn't get the warm channels")
+    if any(not channel.visible_to(moderator) for _, channel, moderator in opened):
+        failures.append("a claimed channel is not visible to its opener")
+    # The tickets are closed while the pool is being refilled: some channels go back into the pool
+    ctx = FakeContext(h.guild, moderators[0], h.guild.text_channels[0])
+    await h.bot.closeall.callback(ctx, 1, "all")
+    await h.settle(30)
+    tickets = [c for c in h.guild.text_channels if "-ticket-" in c.name]
+    if len(tickets) != 10 or h.bot.warm_pool.idle_count(h.guild.id) != 10:
+        failures.append(f"expected 10 warm channels after the tickets were closed, got {len(tickets)}")
+    if any(c.messages or len(c.fake_overwrites) != 1 for c in tickets):
+        failures.append("recycled channels were not emptied and hidden")
+    if h.client.rest.calls["channel.delete"] >= 10:
+        failures.append("no closed ticket channel was recycled")
+    return failures
+
+
+async def scenario_channel_delete_churn(h, report):
+    # Tickets deleted outside the bot must free their numbers without handing out duplicates
+    moderators = h.add_members(40, moderators=True)
+    channels = await asyncio.gather(*(h.create_ticket(mod, f"user{i}", 1) for i, mod in enumerate(moderators)))
+    await asyncio.gather(*(c.delete() for c in channels[::2]))
+    await h.settle(1)
+    await asyncio.gather(*(h.create_ticket(mod, f"again{i}", 1) for i, mod in enumerate(moderators[::2])))
+    await h.settle(5)
+    failures = []
+    names = [c.name for c in h.guild.text_channels if "-ticket-" in c.name]
+    if len(names) != 40 or len(set(names)) != 40:
+        failures.append(f"expected 40 distinct ticket channels, got {len(set(names))} of {len(names)}")
+    if set(names) != {f"ps{s}-ticket-{t}" for s in (1, 2) for t in range(1, 21)}:
+        failures.append("freed ticket numbers were not reused")
+    return failures
+
+
+async def scenario_bulk_clear_20(h, report):
+    # A full ps server is approved, extended and then cleared with the bulk commands
+    moderators = h.add_members(20, moderators=True)
+    h.add_members(20)
+    await asyncio.gather(*(h.create_ticket(mod, f"user{i}", 2) for i, mod in enumerate(moderators)))
+    ctx = FakeContext(h.guild, moderators[0], h.guild.text_channels[0])
+    await h.bot.approveall.callback(ctx, 1)
+    await h.bot.extendall.callback(ctx, 1, 1)
+    await h.settle(10)
+    started = h.loop.time()
+    await h.bot.closeall.callback(ctx, 1, "all")
+    report["bulk_close_seconds"] = round(h.loop.time() - started, 1)
+    await h.settle(10)
+    failures = []
+    left = [c.name for c in h.guild.text_channels if "-ticket-" in c.name]
+    if left:
+        failures.append(f"{len(left)} ticket channel(s) left after !closeall")
+    if len(h.bot.boosts_queue):
+        failures.append(f"{len(h.bot.boosts_queue)} boost(s) still queued after !closeall")
+    if h.bot.ticket_allocator.capacity(h.guild.id).get(1, (0, 0))[0]:
+        failures.append("ticket numbers were not freed")
+    pinned = [m for m in h.guild.text_channels[0].messages.values() if m.pinned]
+    if len(pinned) != 1 or "No active boosts." not in pinned[0].content:
+        failures.append("pinned list was not rendered empty")
+    return failures
+
+
+async def scenario_restart_reconcile(h, report):
+    # The state database is lost while 40 tickets are open; after the restart the ticket numbers are
+    # rebuilt from the channels, and a hand-made duplicate and a stray ticket channel are flagged
+    moderators = h.add_members(50, moderators=True)
+    channels = await asyncio.gather(*(h.create_ticket(mod, f"user{i}", 1) for i, mod in enumerate(moderators[:40])))
+    duplicate = h.guild.add_text_channel(channels[0].name, category=channels[0].category)
+    stray = h.guild.add_text_channel("ps2-ticket-25")
+    h.bot.ticket_allocator = h.bot.TicketAllocator()
+    h.bot.reconciled_guilds.clear()
+    started = time.perf_counter()
+    await h.bot.reconcile_guilds([h.guild])
+    report["reconcile_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    problems = h.bot.reconcile_guild(h.guild)
+    await asyncio.gather(*(h.create_ticket(mod, f"again{i}", 1) for i, mod in enumerate(moderators[40:])))
+    await h.settle(5)
+    failures = []
+    names = [c.name for c in h.guild.text_channels if "-ticket-" in c.name and c not in (duplicate, stray)]
+    if len(names) != 50 or len(set(names)) != 50:
+        failures.append(f"expected 50 distinct ticket channels, got {len(set(names))} of {len(names)}")
+    if not any(duplicate.mention in problem and "duplicates" in problem for problem in problems):
+        failures.append("duplicate ticket channel was not flagged")
+    if not any(stray.mention in problem for problem in problems):
+        failures.append("stray ticket channel was not flagged")
+    return failures
+
+
+async def scenario_restart_pending(h, report):
+    # The bot restarts while 10 summaries wait for Approve/Deny and 10 tickets wait for their
+    # opener; the summaries still answer their buttons and the idle tickets are still deleted
+    moderators = h.add_members(20, moderators=True)
+    summaries = await asyncio.gather(*(h.create_ticket(mod, f"user{i}", 2) for i, mod in enumerate(moderators[:10])))
+    before = set(h.guild.channels)
+    await asyncio.gather(*(h.bot.createticket.callback(FakeContext(h.guild, mod, h.guild.text_channels[0])) for mod in moderators[10:]))
+    idle = [c for c in (h.guild.get_channel(i) for i in set(h.guild.channels) - before) if c is not None and "-ticket-" in c.name]
+    await h.settle(5)
+    started = time.perf_counter()
+    await h.restart()
+    report["restart_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    failures = []
+    views = [h.bot.pending_approvals.get(channel.id) for channel in summaries]
+    if None in views:
+        failures.append(f"{views.count(None)} pending approval(s) lost in the restart")
+    elif not all(view.is_persistent() for view in views):
+        failures.append("restored summaries are not persistent views")
+    else:
+        # Discord routes the presses on the old summary messages to the re-registered views
+        for view in views[:5]:
+            await view.approve.callback(FakeInteraction(h.guild, moderators[0], view.message))
+        for view in views[5:]:
+            await view.deny.callback(FakeInteraction(h.guild, moderators[0], view.message))
+        await h.settle(10)
+        if len(h.bot.boosts_queue) != 5:
+            failures.append(f"expected 5 boosts approved after the restart, got {len(h.bot.boosts_queue)}")
+    if len(h.bot.pending_inactivity) != len(idle):
+        failures.append(f"{len(idle) - len(h.bot.pending_inactivity)} inactivity deadline(s) lost in the restart")
+    await h.settle(h.bot.TICKET_INACTIVITY_TIMEOUT + 30)
+    left = [c.name for c in idle if h.guild.get_channel(c.id) is not None]
+    if left:
+        failures.append(f"{len(left)} idle ticket(s) not deleted after their inactivity deadline")
+    return failures
+
+
+async def scenario_sharded_boosts(h, report):
+    # A shard and the scheduler worker, two copies of bot.py talking over a Unix socket: boosts are
+    # approved, cancelled and extended on the shard and counted down and expired by the worker
+    worker = await h.start_scheduler_worker()
+    moderators = h.add_members(4, moderators=True)
+    h.add_members(4)
+    channels = await asyncio.gather(*(h.create_ticket(mod, f"user{i}", 1) for i, mod in enumerate(moderators)))
+    await asyncio.gather(*(h.press(c, "approve", moderators[0]) for c in channels))
+    await h.settle(10)
+    failures = []
+    if len(worker.boosts_queue) != 4 or len(h.bot.boosts_queue):
+        failures.append(f"expected 4 boosts on the worker and none on the shard, got {len(worker.boosts_queue)} and {len(h.bot.boosts_queue)}")
+    if any(not any("Boost ends" in (m.content or "") for m in c.messages.values()) for c in channels):
+        failures.append("the worker did not post a countdown in every ticket channel")
+    boosts_channel = h.guild.text_channels[0]
+    pinned = [m for m in boosts_channel.messages.values() if m.pinned]
+    if len(pinned) != 1 or not all(f"user{i}" in pinned[0].content for i in range(4)):
+        failures.append("the worker's pinned list does not show the approved boosts")
+    # Chat deletions in the ticket channels never reach the worker
+    chat = await channels[3].send("hello")
+    await chat.delete()
+    cancelled, extended = channels[0], channels[1]
+    ctx = FakeContext(h.guild, moderators[0], cancelled)
+    await h.bot.close.callback(ctx)
+    ctx = FakeContext(h.guild, moderators[0], extended)
+    started = h.loop.time()
+    await h.bot.extend.callback(ctx, 1)
+    report["extend_round_trip_seconds"] = round(h.loop.time() - started, 3)
+    if not any("Boost extended by 1 hour" in (m.content or "") for m in extended.messages.values()):
+        failures.append("!extend got no reply from the worker")
+    await h.settle(10)
+    if cancelled.id in worker.boosts_queue or cancelled.id in h.guild.channels:
+        failures.append("the cancelled boost is still queued or its channel still exists")
+    if "pinned_deleted" in (op for op, _ in h.bot.scheduler_link._backlog) or h.bot.scheduler_link.dropped:
+        failures.append("a chat message deletion was forwarded to the worker")
+    # The two untouched boosts expire on the worker, which deletes their channels; the extended one
+    # outlives them by an hour
+    await h.settle(3600)
+    left = [c for c in channels if c.id in h.guild.channels]
+    if left != [extended] or [entry.ticket_channel_id for entry in worker.boosts_queue] != [extended.id]:
+        failures.append(f"expected only the extended boost to be left, got {[c.name for c in left]}")
+    await h.settle(3600)
+    if len(worker.boosts_queue) or any(c.id in h.guild.channels for c in channels):
+        failures.append("the extended boost did not expire")
+    if any(h.bot.ticket_allocator.channel_info(c.id) for c in channels):
+        failures.append("the shard did not free the expired tickets' numbers")
+    if "No active boosts." not in pinned[0].content:
+        failures.append("the pinned list was not rendered empty")
+    return failures
+
+
+SCENARIOS = {
+    "createticket_burst": scenario_createticket_burst,
+    "gateway_lag_burst": scenario_gateway_lag_burst,
+    "boosts_500": scenario_boosts_500,
+    "expiry_burst_100": scenario_expiry_burst_100,
+    "warm_pool_rush": scenario_warm_pool_rush,
+    "channel_delete_churn": scenario_channel_delete_churn,
+    "bulk_clear_20": scenario_bulk_clear_20,
+    "restart_reconcile": scenario_restart_reconcile,
+    "restart_pending": scenario_restart_pending,
+    "sharded_boosts": scenario_sharded_boosts,
+}
+BOT_MODES = {"sharded_boosts": "shard"}  # scenarios that don't run bot.py standalone
+
+
+def run_scenario(name):
+    loop = VirtualTimeLoop()
+    asyncio.set_event_loop(loop)
+    h = Harness(loop, mode=BOT_MODES.get(name, "standalone"))
+    extra = {}
+    try:
+        loop.run_until_complete(h.start())
+        failures = loop.run_until_complete(SCENARIOS[name](h, extra))
+        metrics, routes = h.report(max(loop.time(), 1.0))
+        metrics.update(extra)
+        if h.worker is not None:
+            loop.run_until_complete(h.stop_scheduler_worker())
+    finally:
+        # Stop the bot's background workers before closing the loop
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        h.close()
+        loop.close()
+    return metrics, routes, failures
+
+
+def compare(name, metrics, baseline):
+    regressions = []
+    for metric, (relative, absolute) in TOLERANCES.items():
+        if metric not in metrics or metric not in baseline:
+            continue
+        limit = baseline[metric] * (1 + relative) + absolute
+        if metrics[metric] > limit:
+            regressions.append(f"{name}.{metric}: {metrics[metric]} > {round(limit, 3)} (baseline {baseline[metric]})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", choices=[[]] + list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results to baseline.json")
+    parser.add_argument("--json", action="store_true", help="print the full results as JSON")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    results = {}
+    problems = []
+    for name in args.scenarios or list(SCENARIOS):
+        metrics, routes, failures = run_scenario(name)
+        results[name] = {"metrics": metrics, "routes": routes}
+        problems += [f"{name}: {failure}" for failure in failures]
+        if not args.update_baseline:
+            problems += compare(name, metrics, baseline.get(name, {}))
+        if not args.json:
+            print(f"== {name}")
+            for metric, value in metrics.items():
+                print(f"  {metric:<24} {value}")
+            for route, stats in routes.items():
+                print(
+                    f"  {route:<24} {stats['calls']:>6} calls  {stats['per_second']:>8}/s  peak {stats['peak_per_second']}/s"
+                    f"  429s {stats['rate_limited']}"
+                )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    if args.update_baseline:
+        baseline.update({name: result["metrics"] for name, result in results.items()})
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+    if problems:
+        print("\nFAILED:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
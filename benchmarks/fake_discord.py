@@ -0,0 +1,470 @@
+"""In-process stand-ins for the discord.py objects bot.py talks to.
+
+The fakes keep just enough state to run the bot's commands, buttons, timers and channel events.
+Every method that would hit Discord's REST API goes through FakeRest, which adds a simulated
+latency, emulates the per-route rate limits (waiting like discord.py does after a 429) and counts
+calls per route. Channel classes subclass the real discord.py types so the bot's isinstance checks
+behave as they do in production.
+"""
+import asyncio
+import itertools
+from collections import Counter, defaultdict, deque
+
+import discord
+
+# route -> (requests, per seconds), per channel (or per guild for channel/category routes)
+RATE_LIMITS = {
+    "message.send": (5, 5.0),
+    "message.edit": (5, 5.0),
+    "message.delete": (5, 5.0),
+    "message.pin": (5, 5.0),
+    "message.bulk_delete": (5, 5.0),
+    "channel.edit": (5, 5.0),
+    "channel.create": (10, 10.0),
+    "channel.delete": (5, 5.0),
+    "category.create": (10, 10.0),
+}
+
+
+class FakeResponse:
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+def not_found():
+    return discord.NotFound(FakeResponse(404, "Not Found"), "Unknown Message")
+
+
+def server_error():
+    return discord.DiscordServerError(FakeResponse(500, "Internal Server Error"), "Internal Server Error")
+
+
+class FakeRest:
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = Counter()  # route -> calls
+        self.per_second = defaultdict(Counter)  # route -> {virtual second: calls}
+        self.rate_limited = Counter()  # route -> calls that would have received a 429
+        self._windows = defaultdict(deque)  # (route, major_id) -> timestamps of recent calls
+        # Called as (route, major_id, limited, retry_after) for a 429 or a response that used up its
+        # bucket, like the X-RateLimit headers bot.py's http_trace reads
+        self.on_rate_limit = None
+
+    async def request(self, route, major_id):
+        loop = asyncio.get_running_loop()
+        limit = RATE_LIMITS.get(route)
+        if limit:
+            count, per = limit
+            window = self._windows[(route, major_id)]
+            limited = False
+            while True:
+                t = loop.time()
+                while window and window[0] <= t - per:
+                    window.popleft()
+                if len(window) < count:
+                    break
+                retry_after = max(window[0] + per - t, 0.001)
+                if not limited:
+                    limited = True
+                    self.rate_limited[route] += 1
+                    self._report(route, major_id, True, retry_after)
+                # Never sleep for less than a millisecond, or float rounding can keep the window full
+                await asyncio.sleep(retry_after)
+            window.append(loop.time())
+            if len(window) == count:
+                self._report(route, major_id, False, window[0] + per - loop.time())
+        self.calls[route] += 1
+        self.per_second[route][int(loop.time())] += 1
+        await asyncio.sleep(self.latency)
+
+    def _report(self, route, major_id, limited, retry_after):
+        if self.on_rate_limit is not None:
+            self.on_rate_limit(route, major_id, limited, retry_after)
+
+    def total(self):
+        return sum(self.calls.values())
+
+    def peak_per_second(self, route):
+        seconds = self.per_second.get(route)
+        return max(seconds.values()) if seconds else 0
+
+
+class FakeClient:
+    def __init__(self, latency=0.05):
+        self.rest = FakeRest(latency)
+        self.guilds = {}
+        self.channels = {}
+        self.users = {}
+        self.gateway_delay = 0.0  # seconds between a REST change and its gateway event
+        self.failing_deletes = Counter()  # channel_id -> deletes that fail with a 500 before one succeeds
+        self.handlers = defaultdict(list)  # event name -> coroutine functions
+        self.http = FakeHTTP(self)
+        self._ids = itertools.count(1 << 32)
+        self._tasks = set()
+        self._every_channel = {}  # channel_id -> channel, deleted ones included
+
+    def snowflake(self):
+        return next(self._ids)
+
+    def on(self, event, handler):
+        self.handlers[event].append(handler)
+
+    def dispatch(self, event, *args):
+        for handler in self.handlers[event]:
+            task = asyncio.create_task(self._deliver(handler, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, handler, args):
+        # Gateway events trail the REST responses by gateway_delay seconds
+        if self.gateway_delay:
+            await asyncio.sleep(self.gateway_delay)
+        await handler(*args)
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_partial_messageable(self, channel_id, guild_id=None):
+        # What the scheduler worker sends through: a deleted channel still answers, with 404s
+        return self._every_channel[channel_id]
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def create_guild(self, name="guild"):
+        guild = FakeGuild(self, self.snowflake(), name)
+        self.guilds[guild.id] = guild
+        return guild
+
+
+class FakeRole:
+    def __init__(self, guild, role_id, name):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+    def __hash__(self):
+        return hash(("role", self.id))
+
+    def __eq__(self, other):
+        return isinstance(other, FakeRole) and other.id == self.id
+
+
+class FakeMember:
+    bot = False
+    discriminator = "0"
+
+    def __init__(self, guild, member_id, name, global_name=None, nick=None, roles=()):
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.global_name = global_name
+        self.nick = nick
+        self.roles = list(roles)
+
+    @property
+    def display_name(self):
+        return self.nick or self.global_name or self.name
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    @property
+    def mutual_guilds(self):
+        return [self.guild]
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    def __str__(self):
+        return self.name
+
+    def __hash__(self):
+        return hash(("member", self.id))
+
+    def __eq__(self, other):
+        return isinstance(other, FakeMember) and other.id == self.id
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, content=None, view=None):
+        self.channel = channel
+        self.id = message_id
+        self.content = content
+        self.view = view
+        self.pinned = False
+        self.edits = 0
+
+    @property
+    def guild(self):
+        return self.channel.guild
+
+    def _live(self):
+        # Partial messages are looked up on use, like the real API does
+        return self.channel.messages.get(self.id)
+
+    async def edit(self, *, content=discord.utils.MISSING, view=discord.utils.MISSING, **kwargs):
+        await self.channel.guild.client.rest.request("message.edit", self.channel.id)
+        message = self._live()
+        if message is None or self.channel.deleted:
+            raise not_found()
+        if content is not discord.utils.MISSING:
+            message.content = content
+        if view is not discord.utils.MISSING:
+            message.view = view
+        message.edits += 1
+        return message
+
+    async def delete(self):
+        await self.channel.guild.client.rest.request("message.delete", self.channel.id)
+        if self.channel.messages.pop(self.id, None) is None:
+            raise not_found()
+        self.channel.guild.client.dispatch("raw_message_delete", FakeRawMessageDelete(self.channel.guild.id, self.channel.id, self.id))
+
+    async def pin(self):
+        await self.channel.guild.client.rest.request("message.pin", self.channel.id)
+        message = self._live()
+        if message is None:
+            raise not_found()
+        message.pinned = True
+
+
+class FakeRawMessageDelete:
+    def __init__(self, guild_id, channel_id, message_id):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+
+
+class FakeCategoryChannel(discord.CategoryChannel):
+    def __init__(self, guild, channel_id, name):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.position = len(guild.channels)
+        self.nsfw = False
+        self.category_id = None
+        self._overwrites = []
+        self.deleted = False
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild, channel_id, name, category=None, topic=None, overwrites=None):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.topic = topic
+        self.category_id = category.id if category else None
+        self.position = len(guild.channels)
+        self.nsfw = False
+        self.slowmode_delay = 0
+        self.last_message_id = None
+        self._overwrites = []
+        self.fake_overwrites = dict(overwrites or {})
+        self.messages = {}
+        self.deleted = False
+
+    async def send(self, content=None, *, view=None, **kwargs):
+        client = self.guild.client
+        await client.rest.request("message.send", self.id)
+        if self.deleted:
+            raise not_found()
+        message = FakeMessage(self, client.snowflake(), content, view)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return self.messages.get(message_id) or FakeMessage(self, message_id)
+
+    async def edit(self, *, overwrites=discord.utils.MISSING, topic=discord.utils.MISSING, **kwargs):
+        await self.guild.client.rest.request("channel.edit", self.id)
+        if self.deleted:
+            raise not_found()
+        if overwrites is not discord.utils.MISSING:
+            self.fake_overwrites = dict(overwrites)
+        if topic is not discord.utils.MISSING:
+            self.topic = topic
+        return self
+
+    async def purge(self, *, limit=100, **kwargs):
+        # One history fetch is folded into the bulk delete
+        await self.guild.client.rest.request("message.bulk_delete", self.id)
+        if self.deleted:
+            raise not_found()
+        deleted = list(self.messages.values())[-limit:] if limit else list(self.messages.values())
+        for message in deleted:
+            del self.messages[message.id]
+        return deleted
+
+    def visible_to(self, member):
+        return member in self.fake_overwrites
+
+    async def delete(self, reason=None):
+        client = self.guild.client
+        await client.rest.request("channel.delete", self.guild.id)
+        if self.deleted:
+            raise not_found()
+        if client.failing_deletes[self.id] > 0:
+            client.failing_deletes[self.id] -= 1
+            raise server_error()
+        self.guild._remove_channel(self)
+
+    def messages_with_view(self, view_type):
+        return [m for m in self.messages.values() if isinstance(m.view, view_type)]
+
+
+class FakeHTTP:
+    # The raw REST calls the scheduler worker makes without a channel cache
+    def __init__(self, client):
+        self.client = client
+
+    async def delete_channel(self, channel_id, reason=None):
+        await self.client._every_channel[channel_id].delete()
+
+
+class FakeGuild:
+    chunked = True
+
+    def __init__(self, client, guild_id, name):
+        self.client = client
+        self.id = guild_id
+        self.name = name
+        self.channels = {}
+        self.roles = []
+        self._members = {}
+        self.default_role = self.create_role("@everyone")
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    @property
+    def text_channels(self):
+        return [c for c in self.channels.values() if isinstance(c, discord.TextChannel)]
+
+    @property
+    def categories(self):
+        return [c for c in self.channels.values() if isinstance(c, discord.CategoryChannel)]
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    def get_member(self, member_id):
+        return self._members.get(member_id)
+
+    def create_role(self, name):
+        role = FakeRole(self, self.client.snowflake(), name)
+        self.roles.append(role)
+        return role
+
+    def add_member(self, name, roles=(), **kwargs):
+        member = FakeMember(self, self.client.snowflake(), name, roles=roles, **kwargs)
+        self._members[member.id] = member
+        self.client.users[member.id] = member
+        return member
+
+    def add_text_channel(self, name, category=None):
+        # Creates a channel without a REST call (setup before the scenario starts)
+        channel = FakeTextChannel(self, self.client.snowflake(), name, category=category)
+        self._add_channel(channel)
+        return channel
+
+    def add_category(self, name):
+        category = FakeCategoryChannel(self, self.client.snowflake(), name)
+        self._add_channel(category)
+        return category
+
+    def _add_channel(self, channel):
+        self.channels[channel.id] = channel
+        self.client.channels[channel.id] = channel
+        self.client._every_channel[channel.id] = channel
+
+    def _remove_channel(self, channel):
+        channel.deleted = True
+        self.channels.pop(channel.id, None)
+        self.client.channels.pop(channel.id, None)
+        self.client.dispatch("guild_channel_delete", channel)
+
+    async def create_category(self, name, **kwargs):
+        await self.client.rest.request("category.create", self.id)
+        category = self.add_category(name)
+        self.client.dispatch("guild_channel_create", category)
+        return category
+
+    async def create_text_channel(self, name, *, overwrites=None, topic=None, category=None, **kwargs):
+        await self.client.rest.request("channel.create", self.id)
+        channel = FakeTextChannel(self, self.client.snowflake(), name, category=category, topic=topic, overwrites=overwrites)
+        self._add_channel(channel)
+        self.client.dispatch("guild_channel_create", channel)
+        return channel
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.messages = []
+        self.modal = None
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self):
+        if self._done:
+            raise discord.InteractionResponded(self.interaction)
+        self._done = True
+        await self.interaction.guild.client.rest.request("interaction.response", self.interaction.id)
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond()
+        self.messages.append(content)
+
+    async def send_modal(self, modal):
+        await self._respond()
+        self.modal = modal
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        await self.interaction.guild.client.rest.request("interaction.followup", self.interaction.id)
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    def __init__(self, guild, user, message=None):
+        self.id = guild.client.snowflake()
+        self.guild = guild
+        self.user = user
+        self.message = message
+        self.channel = message.channel if message else None
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class FakeContext:
+    def __init__(self, guild, author, channel):
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
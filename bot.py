@@ -1,41 +1,278 @@
 print("Bot script is starting...")
 import discord
 from discord.ext import commands
+from discord import app_commands
 import os
 import asyncio
+import time
+import itertools
+import sqlite3
+import threading
+import re
+import signal
+import bisect
+import functools
+import aiohttp
+import json
+from typing import Optional
 
 TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
-intents.members = True
+# MEMBER_CACHE=off runs without the privileged members intent and keeps no member list; the
+# username typed into a ticket is then looked up with a gateway member query instead
+MEMBER_CACHE = os.getenv("MEMBER_CACHE", "on").lower() != "off"
+intents.members = MEMBER_CACHE
+member_cache_flags = discord.MemberCacheFlags.from_intents(intents) if MEMBER_CACHE else discord.MemberCacheFlags.none()
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Every REST request discord.py makes is reported to the metrics section through this trace config
+http_trace = aiohttp.TraceConfig()
+
+# standalone: one process does everything (default)
+# shard: gateway shards handling commands and buttons; boost events go to the scheduler worker
+# scheduler: the worker that owns boost deadlines, countdowns and the pinned lists (REST only)
+BOT_MODE = os.getenv("BOT_MODE", "standalone")
+if BOT_MODE not in ("standalone", "shard", "scheduler"):
+    raise SystemExit(f"Unknown BOT_MODE {BOT_MODE!r}, expected standalone, shard or scheduler.")
+
+if BOT_MODE == "shard":
+    # SHARD_COUNT shards in total; SHARD_IDS ("0,1") picks the ones this process runs
+    shard_ids = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()] or None
+    shard_count = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+    bot = commands.AutoShardedBot(
+        command_prefix='!', intents=intents, member_cache_flags=member_cache_flags, chunk_guilds_at_startup=MEMBER_CACHE,
+        http_trace=http_trace, shard_ids=shard_ids, shard_count=shard_count
+    )
+else:
+    bot = commands.Bot(
+        command_prefix='!', intents=intents, member_cache_flags=member_cache_flags, chunk_guilds_at_startup=MEMBER_CACHE,
+        http_trace=http_trace
+    )
 
 TRIAL_MOD_ROLE_NAME = "Trial Moderator"
 TICKET_CATEGORY_NAME = "Tickets"
 BOOSTS_CHANNEL_NAME = "boosts"
 
 import heapq
+from collections import deque
+
+TICKETS_PER_SERVER = 20
+
+# --- Ticket number allocation ---
+# Per guild, each ps server keeps a bitmask of used ticket numbers (bit n-1 = ticket n), and a
+# min-heap holds the servers that may still have a free slot. Reserving the lowest free number on
+# the lowest non-full server is a heap peek plus a bit trick instead of walking servers and numbers.
+# A reservation is committed once its channel exists, or rolled back if creating it fails.
+class TicketAllocator:
+    def __init__(self, per_server=TICKETS_PER_SERVER):
+        self.per_server = per_server
+        self._full = (1 << per_server) - 1
+        self._used = {}  # guild_id -> {server_number: bitmask}
+        self._open_servers = {}  # guild_id -> heap of server numbers with free slots (full ones skipped lazily)
+        self._owners = {}  # (guild_id, server_number, ticket_number) -> channel_id, None while only reserved
+        self._by_channel = {}  # channel_id -> (guild_id, server_number, ticket_number)
+        self._locks = {}  # guild_id -> asyncio.Lock guarding category creation
+
+    def lock(self, guild_id):
+        if guild_id not in self._locks:
+            self._locks[guild_id] = asyncio.Lock()
+        return self._locks[guild_id]
+
+    def next_server(self, guild_id):
+        # The ps server the next reservation goes to
+        used = self._used.setdefault(guild_id, {})
+        heap = self._open_servers.setdefault(guild_id, [])
+        while heap and used.get(heap[0], 0) == self._full:
+            heapq.heappop(heap)
+        return heap[0] if heap else max(used, default=0) + 1
+
+    def reserve(self, guild_id):
+        server_number = self.next_server(guild_id)
+        used = self._used[guild_id]
+        heap = self._open_servers[guild_id]
+        if not heap:
+            heapq.heappush(heap, server_number)
+        mask = used.get(server_number, 0)
+        free = ~mask & self._full
+        ticket_number = (free & -free).bit_length()
+        used[server_number] = mask | (1 << (ticket_number - 1))
+        self._owners[(guild_id, server_number, ticket_number)] = None
+        return server_number, ticket_number
+
+    def commit(self, guild_id, server_number, ticket_number, channel_id):
+        self._owners[(guild_id, server_number, ticket_number)] = channel_id
+        self._by_channel[channel_id] = (guild_id, server_number, ticket_number)
+
+    def rollback(self, guild_id, server_number, ticket_number):
+        if self._owners.get((guild_id, server_number, ticket_number), 0) is None:
+            self._free(guild_id, server_number, ticket_number)
 
-# Dictionary to keep track of active ticket numbers per guild per server_number
-# Structure: {guild_id: {server_number: set of used ticket numbers}}
-active_tickets_per_server = {}
+    def claim(self, guild_id, server_number, ticket_number, channel_id):
+        # Records an existing channel (restored from state); returns False if another channel holds the number
+        owner = self._owners.get((guild_id, server_number, ticket_number))
+        if owner is not None and owner != channel_id:
+            return False
+        used = self._used.setdefault(guild_id, {})
+        used[server_number] = used.get(server_number, 0) | (1 << (ticket_number - 1))
+        if used[server_number] != self._full:
+            heapq.heappush(self._open_servers.setdefault(guild_id, []), server_number)
+        self.commit(guild_id, server_number, ticket_number, channel_id)
+        return True
+
+    def release_channel(self, channel_id):
+        info = self._by_channel.pop(channel_id, None)
+        if info is not None:
+            self._free(*info)
+        return info
+
+    def channel_info(self, channel_id):
+        return self._by_channel.get(channel_id)
+
+    def _free(self, guild_id, server_number, ticket_number):
+        self._owners.pop((guild_id, server_number, ticket_number), None)
+        used = self._used.get(guild_id, {})
+        mask = used.get(server_number, 0)
+        if not mask & (1 << (ticket_number - 1)):
+            return
+        used[server_number] = mask & ~(1 << (ticket_number - 1))
+        if mask == self._full:
+            # Server just went from full to having a free slot
+            heapq.heappush(self._open_servers.setdefault(guild_id, []), server_number)
+
+    def guild_ids(self):
+        return list(self._used)
+
+    def owner(self, guild_id, server_number, ticket_number):
+        return self._owners.get((guild_id, server_number, ticket_number))
+
+    def guild_channels(self, guild_id):
+        return [channel_id for server_number in list(self._used.get(guild_id, {})) for channel_id in self.channels(guild_id, server_number)]
+
+    def channels(self, guild_id, server_number):
+        # Channel IDs holding ticket numbers on one ps server, in ticket number order
+        owners = (self._owners.get((guild_id, server_number, n)) for n in range(1, self.per_server + 1))
+        return [channel_id for channel_id in owners if channel_id is not None]
+
+    def capacity(self, guild_id):
+        # Occupancy per ps server: {server_number: (used, total)}
+        return {
+            server_number: (bin(mask).count("1"), self.per_server)
+            for server_number, mask in sorted(self._used.get(guild_id, {}).items())
+        }
+
+ticket_allocator = TicketAllocator()
 
 # Global boosts queue data
-# Each entry: {
-#   "author": discord.User,
-#   "discord_username": str,
-#   "discord_user_id": int or None,
-#   "ingame_username": str,
-#   "seconds_left": int,
-#   "ticket_channel": discord.TextChannel,
-#   "task": asyncio.Task,
-#   "server_number": int
-# }
-boosts_queue = []
-boosts_pinned_message = {}  # To store the pinned boosts message per guild per server_number for editing, key: (guild.id, server_number)
+class BoostEntry:
+    # One running boost. Only IDs and plain values are kept, so a queued boost doesn't pin the
+    # channel, guild and user objects in memory; the ticket channel is looked up when it's needed.
+    # The fields are in the column order of the boosts table.
+    __slots__ = (
+        "ticket_channel_id", "guild_id", "server_number", "discord_username",
+        "discord_user_id", "ingame_username", "author_id", "deadline",
+    )
+
+    def __init__(self, ticket_channel_id, guild_id, server_number, discord_username,
+                 discord_user_id, ingame_username, author_id, deadline):
+        self.ticket_channel_id = ticket_channel_id
+        self.guild_id = guild_id
+        self.server_number = server_number
+        self.discord_username = discord_username
+        self.discord_user_id = discord_user_id  # int or None when the name didn't match one member
+        self.ingame_username = ingame_username
+        self.author_id = author_id  # who opened the ticket, or None
+        self.deadline = deadline  # absolute unix timestamp when the boost expires
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(*(record[field] for field in cls.__slots__))
+
+    def row(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def record(self):
+        return dict(zip(self.__slots__, self.row()))
+
+    @property
+    def ticket_channel(self):
+        return resolve_channel(self.ticket_channel_id, self.guild_id)
+
+    @property
+    def user_mention(self):
+        return f"<@{self.discord_user_id}>" if self.discord_user_id else self.discord_username
+
+def resolve_channel(channel_id, guild_id):
+    # The scheduler worker has no channel cache; it trusts the stored IDs and learns about deleted
+    # channels from NotFound errors instead
+    if BOT_MODE == "scheduler":
+        return RemoteChannel(channel_id, guild_id)
+    return bot.get_channel(channel_id)
+
+def resolve_guild(guild_id):
+    if BOT_MODE == "scheduler":
+        return discord.Object(id=guild_id)
+    return bot.get_guild(guild_id)
+
+class BoostQueue:
+    # Boosts partitioned per (guild_id, server_number) in approval order, plus an index by ticket
+    # channel ID. Lookup, insert and removal are O(1) and a render only touches its own partition.
+    def __init__(self):
+        self._partitions = {}  # (guild_id, server_number) -> {ticket_channel_id: entry}, insertion ordered
+        self._by_channel = {}  # ticket_channel_id -> entry
+
+    @staticmethod
+    def partition_key(entry):
+        return (entry.guild_id, entry.server_number)
+
+    def __len__(self):
+        return len(self._by_channel)
+
+    def __iter__(self):
+        return iter(list(self._by_channel.values()))
+
+    def __contains__(self, ticket_channel_id):
+        return ticket_channel_id in self._by_channel
+
+    def add(self, entry):
+        ticket_channel_id = entry.ticket_channel_id
+        self.remove(ticket_channel_id)
+        self._partitions.setdefault(self.partition_key(entry), {})[ticket_channel_id] = entry
+        self._by_channel[ticket_channel_id] = entry
+
+    def get(self, ticket_channel_id):
+        return self._by_channel.get(ticket_channel_id)
+
+    def remove(self, ticket_channel_id):
+        entry = self._by_channel.pop(ticket_channel_id, None)
+        if entry is None:
+            return None
+        key = self.partition_key(entry)
+        partition = self._partitions[key]
+        del partition[ticket_channel_id]
+        if not partition:
+            del self._partitions[key]
+        return entry
+
+    def partition(self, guild_id, server_number):
+        return list(self._partitions.get((guild_id, server_number), {}).values())
+
+    def count(self, guild_id, server_number):
+        return len(self._partitions.get((guild_id, server_number), ()))
+
+    def partition_keys(self):
+        return list(self._partitions)
+
+boosts_queue = BoostQueue()
+# Registry of the pinned boosts pages per guild per server_number, key: (guild.id, server_number),
+# value: [(channel_id, message_id) per page, None where a page's message was deleted]
+# Only IDs are kept; edits go through partial messages, so no message or pin list is ever fetched.
+boosts_pinned_message = {}
+
+def now() -> float:
+    # Single clock used for every deadline, so all timers agree with each other.
+    return time.time()
 
 def seconds_to_hhmmss(seconds: int) -> str:
     hours = seconds // 3600
@@ -43,178 +280,2031 @@ def seconds_to_hhmmss(seconds: int) -> str:
     secs = seconds % 60
     return f"{hours:02d}:{minutes:02d}:{secs:02d}"
 
+def boost_seconds_left(entry) -> int:
+    # Remaining time is derived from the absolute deadline instead of a counter that has to be decremented.
+    return max(0, int(entry.deadline - now() + 0.999))
 
+# --- Countdown display mode ---
+# "timestamp" (default): countdowns are Discord relative timestamps (<t:...:R>) that every client
+# renders live, so a countdown message is posted once and only edited when its deadline changes.
+# "plaintext": countdowns are HH:MM:SS text, refreshed on an adaptive cadence that is coarse far
+# from the deadline and per-second only at the very end.
+COUNTDOWN_DISPLAY_MODE = os.getenv("COUNTDOWN_DISPLAY_MODE", "timestamp").lower()
 
-def format_boosts_list_plaintext(server_number):
-    """
-    Returns the plain-text list of up to 20 boosts for the given server_number.
-    Each line: Discord mention, in-game username, remaining time.
-    """
-    filtered_queue = [entry for entry in boosts_queue if entry.get("server_number") == server_number]
-    lines = []
-    for idx, entry in enumerate(filtered_queue[:20], start=1):
-        mention = f"<@{entry['discord_user_id']}>" if entry.get('discord_user_id') else entry['discord_username']
-        ingame = entry['ingame_username']
-        time_left = seconds_to_hhmmss(entry['seconds_left'])
-        line = f"{idx}. {mention} | In-game: {ingame} | Time left: {time_left}"
-        lines.append(line)
-    if lines:
-        return "\n".join(lines)
-    else:
-        return "No active boosts."
+def use_timestamps() -> bool:
+    return COUNTDOWN_DISPLAY_MODE != "plaintext"
+
+def relative_timestamp(deadline) -> str:
+    return f"<t:{int(deadline)}:R>"
+
+def countdown_refresh_interval(seconds_left) -> int:
+    if seconds_left > 3600:
+        return 300
+    if seconds_left > 600:
+        return 60
+    if seconds_left > 60:
+        return 15
+    if seconds_left > 10:
+        return 5
+    return 1
+
+# --- Deadline scheduler ---
+# One task per scheduler sleeps until the earliest deadline in a min-heap, so the number of
+# event loop wakeups follows the number of expirations rather than (timers x seconds).
+class DeadlineScheduler:
+    def __init__(self, on_expire):
+        self.on_expire = on_expire  # coroutine function called with the expired key
+        self._heap = []  # (deadline, seq, key); superseded items are skipped lazily
+        self._live = {}  # key -> (deadline, seq) of the current heap item for that key
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._callbacks = set()
+
+    def __contains__(self, key):
+        return key in self._live
+
+    def __len__(self):
+        return len(self._live)
+
+    def deadline(self, key):
+        item = self._live.get(key)
+        return item[0] if item else None
+
+    def schedule(self, key, deadline):
+        # Adding or rescheduling a key is a single heap push: O(log n).
+        seq = next(self._seq)
+        self._live[key] = (deadline, seq)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        if self._heap[0][1] == seq:
+            # New earliest deadline, wake the runner so it can shorten its sleep
+            self._wakeup.set()
+        self._compact()
+        self._ensure_running()
+
+    def extend(self, key, seconds):
+        deadline = self.deadline(key)
+        if deadline is None:
+            return None
+        deadline += seconds
+        self.schedule(key, deadline)
+        return deadline
+
+    def cancel(self, key):
+        # The heap item stays behind and is discarded when it reaches the top.
+        return self._live.pop(key, None) is not None
+
+    def _compact(self):
+        # Keep stale items from piling up when keys are rescheduled or cancelled a lot
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [(d, seq, key) for key, (d, seq) in self._live.items()]
+            heapq.heapify(self._heap)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _is_stale(self, item):
+        deadline, seq, key = item
+        return self._live.get(key) != (deadline, seq)
+
+    async def _run(self):
+        while True:
+            while self._heap and self._is_stale(self._heap[0]):
+                heapq.heappop(self._heap)
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - now()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, key = heapq.heappop(self._heap)
+            del self._live[key]
+            # Expiry handlers do REST calls; run them beside the scheduler so one slow cleanup
+            # doesn't hold back the next deadline.
+            task = asyncio.create_task(self._fire(key))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _fire(self, key):
+        try:
+            await self.on_expire(key)
+        except Exception as e:
+            print(f"Error while expiring {key!r}: {e}")
+
+# --- Durable state ---
+# Boosts, ticket numbers and message IDs are kept in a SQLite database (WAL mode) so a restart can
+# pick up where the bot left off. Writes are queued and group-committed from a worker thread, so
+# approvals and expirations never wait on fsync in the event loop.
+STATE_DB_PATH = os.getenv("BOT_STATE_DB", "bot_state.sqlite3")
+STATE_FLUSH_INTERVAL = 0.5  # seconds of writes grouped into a single transaction
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS boosts (
+    ticket_channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    server_number INTEGER NOT NULL,
+    discord_username TEXT NOT NULL,
+    discord_user_id INTEGER,
+    ingame_username TEXT NOT NULL,
+    author_id INTEGER,
+    deadline REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    server_number INTEGER NOT NULL,
+    ticket_number INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pinned_pages (
+    guild_id INTEGER NOT NULL,
+    server_number INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, server_number, page)
+);
+CREATE TABLE IF NOT EXISTS countdown_messages (
+    ticket_channel_id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    inactivity_timeout INTEGER
+);
+CREATE TABLE IF NOT EXISTS idle_channels (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pending_approvals (
+    ticket_channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    server_number INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    discord_username TEXT NOT NULL,
+    ingame_username TEXT NOT NULL,
+    hours_left TEXT NOT NULL,
+    message_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inactivity_deadlines (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    opener_id INTEGER NOT NULL,
+    deadline REAL NOT NULL,
+    message_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    ticket_channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+class StateStore:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._pending = []  # (sql, params) waiting for the next group commit
+        self._flush_task = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(STATE_SCHEMA)
+        return self._conn
+
+    def load(self):
+        # Bulk load of everything needed to rebuild the in-memory state. Blocking, run it in a thread.
+        with self._lock:
+            conn = self._connect()
+            return {
+                "boosts": conn.execute(
+                    "SELECT ticket_channel_id, guild_id, server_number, discord_username, discord_user_id, "
+                    "ingame_username, author_id, deadline FROM boosts ORDER BY rowid"
+                ).fetchall(),
+                "tickets": conn.execute(
+                    "SELECT channel_id, guild_id, server_number, ticket_number FROM tickets"
+                ).fetchall(),
+                "pinned_pages": conn.execute(
+                    "SELECT guild_id, server_number, page, channel_id, message_id FROM pinned_pages"
+                ).fetchall(),
+                "countdown_messages": conn.execute(
+                    "SELECT ticket_channel_id, message_id FROM countdown_messages"
+                ).fetchall(),
+                "guild_settings": conn.execute(
+                    "SELECT guild_id, inactivity_timeout FROM guild_settings"
+                ).fetchall(),
+                "idle_channels": conn.execute(
+                    "SELECT channel_id, guild_id FROM idle_channels ORDER BY rowid"
+                ).fetchall(),
+                "dead_letters": conn.execute(
+                    "SELECT ticket_channel_id, guild_id FROM dead_letters"
+                ).fetchall(),
+                "pending_approvals": conn.execute(
+                    "SELECT ticket_channel_id, guild_id, server_number, author_id, discord_username, "
+                    "ingame_username, hours_left, message_id FROM pending_approvals"
+                ).fetchall(),
+                "inactivity_deadlines": conn.execute(
+                    "SELECT channel_id, guild_id, opener_id, deadline, message_id FROM inactivity_deadlines"
+                ).fetchall(),
+            }
+
+    def _write(self, sql, params):
+        self._pending.append((sql, params))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._pending:
+            await asyncio.sleep(STATE_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self):
+        batch, self._pending = self._pending, []
+        if batch:
+            try:
+                await asyncio.to_thread(self._commit, batch)
+            except Exception as e:
+                print(f"Failed to save bot state: {e}")
+
+    def _commit(self, batch):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for sql, params in batch:
+                    conn.execute(sql, params)
+
+    def close(self):
+        # Commits the writes still waiting for a group commit and closes the database. Called once
+        # the event loop has stopped, so nothing can queue a write behind it.
+        batch, self._pending = self._pending, []
+        if batch:
+            self._commit(batch)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def save_boost(self, entry):
+        self._write("INSERT OR REPLACE INTO boosts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entry.row())
+
+    def delete_boost(self, ticket_channel_id):
+        self._write("DELETE FROM boosts WHERE ticket_channel_id = ?", (ticket_channel_id,))
+
+    def save_ticket(self, channel_id, guild_id, server_number, ticket_number):
+        self._write("INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?)", (channel_id, guild_id, server_number, ticket_number))
+
+    def delete_ticket(self, channel_id):
+        self._write("DELETE FROM tickets WHERE channel_id = ?", (channel_id,))
+
+    def save_pinned_page(self, guild_id, server_number, page, message):
+        self._write(
+            "INSERT OR REPLACE INTO pinned_pages VALUES (?, ?, ?, ?, ?)",
+            (guild_id, server_number, page, message.channel.id, message.id),
+        )
+
+    def delete_pinned_page(self, guild_id, server_number, page):
+        self._write(
+            "DELETE FROM pinned_pages WHERE guild_id = ? AND server_number = ? AND page = ?",
+            (guild_id, server_number, page),
+        )
+
+    def save_countdown_message(self, ticket_channel_id, message_id):
+        self._write("INSERT OR REPLACE INTO countdown_messages VALUES (?, ?)", (ticket_channel_id, message_id))
+
+    def delete_countdown_message(self, ticket_channel_id):
+        self._write("DELETE FROM countdown_messages WHERE ticket_channel_id = ?", (ticket_channel_id,))
+
+    def save_inactivity_timeout(self, guild_id, seconds):
+        self._write(
+            "INSERT INTO guild_settings (guild_id, inactivity_timeout) VALUES (?, ?) "
+            "ON CONFLICT(guild_id) DO UPDATE SET inactivity_timeout = excluded.inactivity_timeout",
+            (guild_id, seconds),
+        )
+
+    def save_idle_channel(self, channel_id, guild_id):
+        self._write("INSERT OR REPLACE INTO idle_channels VALUES (?, ?)", (channel_id, guild_id))
+
+    def delete_idle_channel(self, channel_id):
+        self._write("DELETE FROM idle_channels WHERE channel_id = ?", (channel_id,))
+
+    def save_pending_approval(self, view):
+        self._write("INSERT OR REPLACE INTO pending_approvals VALUES (?, ?, ?, ?, ?, ?, ?, ?)", view.row())
+
+    def delete_pending_approval(self, ticket_channel_id):
+        self._write("DELETE FROM pending_approvals WHERE ticket_channel_id = ?", (ticket_channel_id,))
+
+    def save_inactivity_deadline(self, channel_id, info):
+        message = info["message"]
+        self._write(
+            "INSERT OR REPLACE INTO inactivity_deadlines VALUES (?, ?, ?, ?, ?)",
+            (channel_id, info["channel"].guild.id, info["opener_id"], info["deadline"], message.id if message else None),
+        )
+
+    def delete_inactivity_deadline(self, channel_id):
+        self._write("DELETE FROM inactivity_deadlines WHERE channel_id = ?", (channel_id,))
+
+    def save_dead_letter(self, ticket_channel_id, guild_id, attempts, error, failed_at):
+        self._write("INSERT OR REPLACE INTO dead_letters VALUES (?, ?, ?, ?, ?)", (ticket_channel_id, guild_id, attempts, error, failed_at))
+
+    def delete_dead_letter(self, ticket_channel_id):
+        self._write("DELETE FROM dead_letters WHERE ticket_channel_id = ?", (ticket_channel_id,))
+
+state_store = StateStore(STATE_DB_PATH)
+
+# --- Runtime metrics ---
+# Counters and histograms are plain dicts keyed by label values, so recording on the per-second
+# paths is a dict update (plus a bisect for histograms). Gauges are read only when someone looks:
+# queue sizes, slot occupancy and timer counts are computed at scrape time from the live structures.
+# Everything is served in the Prometheus text format on METRICS_HOST:METRICS_PORT (0 disables it)
+# and summarized by !botstats.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+LOOP_LAG_INTERVAL = 0.5  # seconds between event loop lag probes
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+class MetricCounter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}  # label values -> count
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, format_labels(self.labels, labels), value
+
+class MetricHistogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}  # label values -> [count per bucket (+Inf last), sum, count]
+
+    def observe(self, value, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def summary(self, *labels):
+        # (count, mean, approximate p95 as the upper bound of the bucket it falls in)
+        series = self.values.get(labels)
+        if not series or not series[2]:
+            return 0, 0.0, 0.0
+        counts, total, count = series
+        target = count * 0.95
+        seen = 0
+        p95 = float("inf")
+        for bound, bucket in zip(self.buckets, counts):
+            seen += bucket
+            if seen >= target:
+                p95 = bound
+                break
+        return count, total / count, p95
+
+    def samples(self):
+        names = self.labels + ("le",)
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket", format_labels(names, labels + (bound,)), cumulative
+            yield f"{self.name}_sum", format_labels(self.labels, labels), total
+            yield f"{self.name}_count", format_labels(self.labels, labels), count
+
+class MetricGauge:
+    # Also used for counters that the code they measure already keeps (kind="counter")
+    def __init__(self, name, help_text, labels, collect, kind="gauge"):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.collect = collect  # callable returning {label values: value}
+
+    def samples(self):
+        for labels, value in self.collect().items():
+            yield self.name, format_labels(self.labels, labels), value
+
+class Metrics:
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(MetricCounter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self._register(MetricHistogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, labels, collect, kind="gauge"):
+        return self._register(MetricGauge(name, help_text, labels, collect, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {value}")
+            except Exception as e:
+                print(f"Failed to collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+action_calls = metrics.counter("bot_actions_total", "Commands and buttons handled, by outcome.", ("kind", "name", "outcome"))
+action_seconds = metrics.histogram("bot_action_seconds", "Time spent handling commands and buttons.", ("kind", "name"))
+render_calls = metrics.counter("bot_pinned_renders_total", "Pinned boosts list renders, by result.", ("result",))
+render_seconds = metrics.histogram("bot_pinned_render_seconds", "Time taken by pinned boosts list edits.")
+page_edits = metrics.counter("bot_pinned_page_edits_total", "Pinned boosts pages edited or posted.")
+api_calls = metrics.counter("bot_api_requests_total", "REST requests sent to Discord, by route and status.", ("method", "route", "status"))
+api_seconds = metrics.histogram("bot_api_request_seconds", "REST request latency, by route.", ("method", "route"))
+api_rate_limited = metrics.counter("bot_api_rate_limited_total", "REST responses with status 429, by route.", ("method", "route"))
+outbound_calls = metrics.counter("bot_outbound_calls_total", "Calls run by the outbound dispatcher.", ("route", "priority"))
+loop_lag = metrics.histogram("bot_event_loop_lag_seconds", "How late the event loop ran a timer that was due.", buckets=LAG_BUCKETS)
+expiry_deletes = metrics.counter("bot_expiry_channel_deletes_total", "Ticket channel deletes after a boost expired, by result.", ("result",))
+last_loop_lag = 0.0
+
+def collect_boost_queues():
+    return {key: boosts_queue.count(*key) for key in boosts_queue.partition_keys()}
+
+def collect_ticket_slots():
+    slots = {}
+    for guild_id in ticket_allocator.guild_ids():
+        for server_number, (used, total) in ticket_allocator.capacity(guild_id).items():
+            warm = warm_pool.idle_count(guild_id, server_number)
+            slots[(guild_id, server_number, "used")] = used - warm
+            slots[(guild_id, server_number, "warm")] = warm
+            slots[(guild_id, server_number, "free")] = total - used
+    return slots
+
+def collect_timers():
+    return {
+        ("boost_expiry",): len(boost_scheduler),
+        ("countdown_refresh",): len(countdown_refresher),
+        ("inactivity",): len(inactivity_timers),
+    }
+
+metrics.gauge("bot_boosts_queued", "Boosts in the queue per ps server.", ("guild", "server_number"), collect_boost_queues)
+metrics.gauge("bot_ticket_slots", "Ticket slots per ps server, by state.", ("guild", "server_number", "state"), collect_ticket_slots)
+metrics.gauge("bot_scheduled_timers", "Deadlines waiting in each scheduler.", ("scheduler",), collect_timers)
+metrics.gauge("bot_asyncio_tasks", "Tasks alive on the event loop.", (), lambda: {(): len(asyncio.all_tasks())})
+metrics.gauge("bot_outbound_queued", "Calls queued in the outbound dispatcher.", ("priority",),
+              lambda: {(name,): n for name, n in outbound.depth().items()})
+metrics.gauge("bot_outbound_shed_total", "Cosmetic calls merged into a newer call or dropped.", ("reason",),
+              lambda: {("merged",): outbound.merged, ("dropped",): outbound.dropped}, kind="counter")
+metrics.gauge("bot_event_loop_lag_last_seconds", "Lag measured by the latest probe.", (), lambda: {(): last_loop_lag})
+metrics.gauge("bot_expiry_pending", "Expired boosts and ticket channel deletes not cleaned up yet.", (), lambda: {(): expiry_pipeline.pending()})
+
+def record_action(kind, name, outcome, seconds):
+    action_calls.inc(kind, name, outcome)
+    action_seconds.observe(seconds, kind, name)
+
+def instrumented(kind, name):
+    # Counts and times a button or slash command callback
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                record_action(kind, name, outcome, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+# REST paths with their snowflakes replaced, so each route is one series however many channels exist
+SNOWFLAKE_RE = re.compile(r"/\d{15,}")
+# Interaction and webhook tokens are unique per use; left in the label, every button press would
+# start new time series
+TOKEN_RE = re.compile(r"^(/(?:interactions|webhooks)/\{id\})/[^/]+")
 
-async def update_boosts_message(guild, server_number):
-    global boosts_pinned_message
-    boosts_channel = discord.utils.get(guild.text_channels, name=BOOSTS_CHANNEL_NAME)
+# Matches the channel a REST path acts on
+CHANNEL_PATH_RE = re.compile(r"^/channels/(\d+)")
+
+# channel_id -> (got a 429, seconds until its bucket refills), for channels whose calls Discord
+# answered with a 429 or an exhausted bucket since the boosts renderer last looked
+channel_rate_limits = {}
+
+def note_rate_limit(channel_id, limited, retry_after):
+    seen_limited, seen_retry_after = channel_rate_limits.get(channel_id, (False, 0.0))
+    channel_rate_limits[channel_id] = (limited or seen_limited, max(retry_after, seen_retry_after))
+
+def api_route(url):
+    path = url.path
+    if path.startswith("/api/v"):
+        path = path.split("/", 3)[-1]
+    route = SNOWFLAKE_RE.sub("/{id}", "/" + path.lstrip("/"))
+    return TOKEN_RE.sub(r"\1/{token}", route)
+
+def api_channel_id(url):
+    path = url.path
+    if path.startswith("/api/v"):
+        path = path.split("/", 3)[-1]
+    match = CHANNEL_PATH_RE.match("/" + path.lstrip("/"))
+    return int(match.group(1)) if match else None
+
+async def on_api_request_start(session, context, params):
+    context.started = time.perf_counter()
+
+async def on_api_request_end(session, context, params):
+    route = api_route(params.url)
+    status = params.response.status
+    api_calls.inc(params.method, route, status)
+    api_seconds.observe(time.perf_counter() - context.started, params.method, route)
+    if status == 429:
+        api_rate_limited.inc(params.method, route)
+    headers = params.response.headers
+    if status == 429 or headers.get("X-RateLimit-Remaining") == "0":
+        channel_id = api_channel_id(params.url)
+        if channel_id is not None:
+            retry_after = headers.get("Retry-After") if status == 429 else None
+            note_rate_limit(channel_id, status == 429, float(retry_after or headers.get("X-RateLimit-Reset-After") or 0))
+
+http_trace.on_request_start.append(on_api_request_start)
+http_trace.on_request_end.append(on_api_request_end)
+
+async def monitor_loop_lag():
+    # Sleeps a fixed interval and records how much later than asked the loop woke it up
+    global last_loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        last_loop_lag = max(0.0, loop.time() - started - LOOP_LAG_INTERVAL)
+        loop_lag.observe(last_loop_lag)
+
+async def serve_metrics(reader, writer):
+    # Minimal HTTP/1.0 responder: GET /metrics returns the Prometheus text format
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", metrics.render().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+metrics_tasks = []
+
+async def start_metrics():
+    metrics_tasks.append(asyncio.create_task(monitor_loop_lag()))
+    if METRICS_PORT:
+        try:
+            server = await asyncio.start_server(serve_metrics, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            print(f"Failed to start the metrics endpoint on {METRICS_HOST}:{METRICS_PORT}: {e}")
+            return
+        metrics_tasks.append(server)
+        print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+# --- Outbound REST dispatcher ---
+# Background REST calls (pinned lists, countdowns, expiry notices, channel deletions) go through one
+# dispatcher instead of competing in discord.py's buckets in whatever order they were awaited.
+# - Priority classes: critical work (approvals, expiry notices, channel deletions) is always taken
+#   before normal work, and normal before cosmetic edits.
+# - Per-route token budgets, keyed by (route, channel or guild ID), pace calls below Discord's limits.
+#   A call without budget is parked behind its route until a token frees up, highest priority
+#   first, instead of holding a worker; each token is handed to exactly one waiting call.
+# - Bounded per-guild queues, served round-robin, so one busy guild can't starve the others.
+#   A cosmetic call with a merge key replaces the pending call with the same key; when a guild's
+#   queue is full, cosmetic calls are dropped and other calls wait for room (backpressure).
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_COSMETIC = 2
+PRIORITY_NAMES = ("critical", "normal", "cosmetic")
+UNDELIVERED = object()  # result of a cosmetic call that was dropped before it ran
+
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "4"))
+OUTBOUND_GUILD_QUEUE_LIMIT = int(os.getenv("OUTBOUND_GUILD_QUEUE_LIMIT", "200"))
+
+# route -> (tokens per second, burst) for each channel (or guild, for channel deletes). Channel
+# deletes get no burst and a little headroom: on top of a 1/s refill, any burst overruns Discord's
+# 5 per 5 seconds per guild.
+ROUTE_BUDGETS = {
+    "message.send": (1.0, 5),
+    "message.edit": (1.0, 5),
+    "message.delete": (1.0, 5),
+    "message.pin": (0.2, 2),
+    "channel.delete": (0.95, 1),
+}
+DEFAULT_ROUTE_BUDGET = (1.0, 5)
+OUTBOUND_BUCKET_PRUNE_INTERVAL = 60.0  # seconds between sweeps for refilled route buckets
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now()
+
+    def take(self):
+        # Takes a token and returns 0, or returns how many seconds until one is available
+        t = now()
+        self.tokens = min(self.capacity, self.tokens + (t - self.updated) * self.rate)
+        self.updated = t
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def full(self):
+        return self.tokens + (now() - self.updated) * self.rate >= self.capacity
+
+class OutboundCall:
+    __slots__ = ("guild_id", "route", "major_id", "factory", "priority", "merge_key", "future")
+
+    def __init__(self, guild_id, route, major_id, factory, priority, merge_key):
+        self.guild_id = guild_id
+        self.route = route
+        self.major_id = major_id
+        self.factory = factory  # zero-argument callable returning the coroutine to run
+        self.priority = priority
+        self.merge_key = merge_key
+        self.future = asyncio.get_running_loop().create_future()
+        # Fire-and-forget callers never look at the result; don't warn about unretrieved exceptions
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+class OutboundDispatcher:
+    def __init__(self, workers=OUTBOUND_WORKERS, guild_queue_limit=OUTBOUND_GUILD_QUEUE_LIMIT):
+        self.worker_count = workers
+        self.guild_queue_limit = guild_queue_limit
+        self._queues = {}  # guild_id -> [deque per priority]
+        self._sizes = {}  # guild_id -> number of queued calls
+        self._ready = deque()  # guild IDs with queued calls, in round-robin order
+        self._ready_set = set()
+        self._merge = {}  # merge_key -> queued cosmetic call
+        self._parked = []  # heap of (ready_at, seq, bucket key) for budgets with waiting calls
+        self._waiting = {}  # (route, major_id) -> heap of (priority, seq, call) waiting for a token
+        self._seq = itertools.count()
+        self._buckets = {}  # (route, major_id) -> TokenBucket
+        self._next_prune = 0.0
+        self._work = asyncio.Event()
+        self._room = asyncio.Event()
+        self._workers = []
+        self.dropped = 0
+        self.merged = 0
+
+    def depth(self, guild_id=None):
+        # Queued calls per priority class, for one guild or all of them
+        if guild_id is None:
+            queues = self._queues.values()
+        else:
+            queues = [self._queues[guild_id]] if guild_id in self._queues else []
+        totals = {name: 0 for name in PRIORITY_NAMES}
+        for queue in queues:
+            for priority, calls in enumerate(queue):
+                totals[PRIORITY_NAMES[priority]] += len(calls)
+        if guild_id is None:
+            totals["parked"] = sum(len(waiters) for waiters in self._waiting.values())
+        return totals
+
+    async def call(self, guild_id, route, major_id, factory, priority=PRIORITY_NORMAL, merge_key=None):
+        # Queues a call and waits for its result (UNDELIVERED if a cosmetic call was dropped)
+        future = await self.submit(guild_id, route, major_id, factory, priority, merge_key)
+        return await future
+
+    async def submit(self, guild_id, route, major_id, factory, priority=PRIORITY_NORMAL, merge_key=None):
+        # Queues a call and returns its future without waiting for the call itself
+        self._ensure_workers()
+        call = OutboundCall(guild_id, route, major_id, factory, priority, merge_key)
+        if merge_key is not None and priority == PRIORITY_COSMETIC:
+            pending = self._merge.get(merge_key)
+            if pending is not None and not pending.future.done():
+                # Newer content supersedes the queued edit; reuse its place in the queue
+                pending.factory = factory
+                self.merged += 1
+                return pending.future
+        while self._sizes.get(guild_id, 0) >= self.guild_queue_limit:
+            if priority == PRIORITY_COSMETIC:
+                self.dropped += 1
+                call.future.set_result(UNDELIVERED)
+                return call.future
+            if not self._evict_cosmetic(guild_id):
+                self._room.clear()
+                await self._room.wait()
+        self._enqueue(call)
+        return call.future
+
+    def _enqueue(self, call):
+        queue = self._queues.get(call.guild_id)
+        if queue is None:
+            queue = self._queues[call.guild_id] = [deque(), deque(), deque()]
+        queue[call.priority].append(call)
+        if call.merge_key is not None:
+            self._merge[call.merge_key] = call
+        if call.guild_id not in self._ready_set:
+            self._ready_set.add(call.guild_id)
+            self._ready.append(call.guild_id)
+        self._sizes[call.guild_id] = self._sizes.get(call.guild_id, 0) + 1
+        self._work.set()
+
+    def _evict_cosmetic(self, guild_id):
+        cosmetic = self._queues[guild_id][PRIORITY_COSMETIC]
+        if not cosmetic:
+            return False
+        call = cosmetic.popleft()
+        self._forget(call)
+        self.dropped += 1
+        call.future.set_result(UNDELIVERED)
+        return True
+
+    def _forget(self, call):
+        if call.merge_key is not None and self._merge.get(call.merge_key) is call:
+            del self._merge[call.merge_key]
+        self._sizes[call.guild_id] -= 1
+        if not self._sizes[call.guild_id]:
+            del self._sizes[call.guild_id]
+            del self._queues[call.guild_id]
+        self._room.set()
+
+    def _next_call(self):
+        # Returns the next call to run, with its route token already taken, or None
+        if self._buckets and now() >= self._next_prune:
+            self._prune_buckets()
+        while self._parked and self._parked[0][0] <= now():
+            _, _, key = heapq.heappop(self._parked)
+            call = self._release(key)
+            if call is not None:
+                return call
+        while True:
+            call = self._next_queued()
+            if call is None or self._admit(call):
+                return call
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*ROUTE_BUDGETS.get(key[0], DEFAULT_ROUTE_BUDGET))
+        return bucket
+
+    def _prune_buckets(self):
+        # Every ticket channel gets its own buckets; a full one is the same as a new one, so those
+        # of channels that went quiet (or were deleted) are dropped instead of kept forever
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if key in self._waiting or not bucket.full()
+        }
+        self._next_prune = now() + OUTBOUND_BUCKET_PRUNE_INTERVAL
+
+    def _admit(self, call):
+        # Takes a route token for the call, or parks it behind its budget and returns False
+        if call.future.done():
+            return False
+        key = (call.route, call.major_id)
+        waiters = self._waiting.get(key)
+        if waiters is None:
+            wait = self._bucket(key).take()
+            if not wait:
+                return True
+            waiters = self._waiting[key] = []
+            heapq.heappush(self._parked, (now() + wait, next(self._seq), key))
+        heapq.heappush(waiters, (call.priority, next(self._seq), call))
+        if call.merge_key is not None:
+            # Still mergeable while parked
+            self._merge[call.merge_key] = call
+        return False
+
+    def _release(self, key):
+        # Hands the budget's next token to its highest priority waiting call
+        waiters = self._waiting[key]
+        while waiters and waiters[0][2].future.done():
+            heapq.heappop(waiters)
+        if not waiters:
+            del self._waiting[key]
+            return None
+        wait = self._bucket(key).take()
+        if wait:
+            heapq.heappush(self._parked, (now() + wait, next(self._seq), key))
+            return None
+        _, _, call = heapq.heappop(waiters)
+        if waiters:
+            heapq.heappush(self._parked, (now(), next(self._seq), key))
+        else:
+            del self._waiting[key]
+        if call.merge_key is not None and self._merge.get(call.merge_key) is call:
+            del self._merge[call.merge_key]
+        return call
+
+    def _next_queued(self):
+        # Guilds take turns; each turn serves the guild's highest priority call, and critical work
+        # from any guild goes before everything else
+        for priority in (PRIORITY_CRITICAL, None):
+            for _ in range(len(self._ready)):
+                guild_id = self._ready.popleft()
+                queue = self._queues.get(guild_id)
+                if queue is None:
+                    self._ready_set.discard(guild_id)
+                    continue
+                calls = queue[priority] if priority is not None else next((q for q in queue if q), None)
+                if not calls:
+                    self._ready.append(guild_id)
+                    continue
+                call = calls.popleft()
+                self._forget(call)
+                if self._sizes.get(guild_id):
+                    self._ready.append(guild_id)
+                else:
+                    self._ready_set.discard(guild_id)
+                return call
+        return None
+
+    def _ensure_workers(self):
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < self.worker_count:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            call = self._next_call()
+            if call is None:
+                self._work.clear()
+                wakeups = [self._parked[0][0]] if self._parked else []
+                if self._buckets:
+                    # Come back for the next bucket sweep even if no call arrives
+                    wakeups.append(self._next_prune)
+                timeout = max(0.0, min(wakeups) - now()) if wakeups else None
+                try:
+                    await asyncio.wait_for(self._work.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            outbound_calls.inc(call.route, PRIORITY_NAMES[call.priority])
+            try:
+                result = await call.factory()
+            except Exception as e:
+                if not call.future.done():
+                    call.future.set_exception(e)
+            else:
+                if not call.future.done():
+                    call.future.set_result(result)
+
+outbound = OutboundDispatcher()
+
+# --- Resolved entity cache ---
+# Maps the configured channel, category and role names to IDs once per guild so the hot paths
+# resolve them with an O(1) get_channel/get_role instead of scanning every channel or role.
+# Entries are dropped by the channel/role create, update and delete events, and a cached ID whose
+# entity no longer carries the expected name is resolved again, so renames take effect immediately.
+class GuildEntityCache:
+    def __init__(self):
+        self._ids = {}  # guild_id -> {(kind, name): entity_id or None when not present}
+
+    def _lookup(self, guild, kind, name, candidates, getter):
+        cache = self._ids.setdefault(guild.id, {})
+        key = (kind, name)
+        if key in cache:
+            entity_id = cache[key]
+            if entity_id is None:
+                return None
+            entity = getter(entity_id)
+            if entity is not None and entity.name == name:
+                return entity
+        entity = discord.utils.get(candidates(), name=name)
+        cache[key] = entity.id if entity else None
+        return entity
+
+    def text_channel(self, guild, name):
+        return self._lookup(guild, "text", name, lambda: guild.text_channels, guild.get_channel)
+
+    def category(self, guild, name):
+        return self._lookup(guild, "category", name, lambda: guild.categories, guild.get_channel)
+
+    def role(self, guild, name):
+        return self._lookup(guild, "role", name, lambda: guild.roles, guild.get_role)
+
+    def remember(self, guild_id, kind, name, entity_id):
+        # For entities the bot just created: the gateway's create event may arrive much later
+        self._ids.setdefault(guild_id, {})[(kind, name)] = entity_id
+
+    def invalidate(self, guild_id, kind, *names):
+        cache = self._ids.get(guild_id)
+        if cache:
+            for name in names:
+                cache.pop((kind, name), None)
+
+    def forget_guild(self, guild_id):
+        self._ids.pop(guild_id, None)
+
+entity_cache = GuildEntityCache()
+
+def channel_kind(channel):
+    if isinstance(channel, discord.CategoryChannel):
+        return "category"
+    if isinstance(channel, discord.TextChannel):
+        return "text"
+    return None
+
+
+
+# --- Pinned boosts board ---
+# Each server's queue is spread over as many pinned pages as it needs, each within Discord's
+# message length limit. A boost stays on the page it was first placed on, so adding, extending or
+# removing one only changes the page that holds it; new boosts go on the last page. Lines are cached
+# with everything they depend on and only formatted again when that changes.
+BOOSTS_PAGE_LIMIT = 2000
+
+def boosts_list_marker(server_number, page=0):
+    # First line of each pinned page, so the lists of different ps servers are told apart at a glance
+    if page:
+        return f"**ps{server_number} boosts (page {page + 1})**"
+    return f"**ps{server_number} boosts**"
+
+def format_boost_line(position, entry):
+    # Each line: position on the page, Discord mention, in-game username, remaining time
+    mention = entry.user_mention
+    ingame = entry.ingame_username
+    if use_timestamps():
+        return f"{position}. {mention} | In-game: {ingame} | Ends: {relative_timestamp(entry.deadline)}"
+    time_left = seconds_to_hhmmss(boost_seconds_left(entry))
+    return f"{position}. {mention} | In-game: {ingame} | Time left: {time_left}"
+
+def boost_line_signature(position, entry):
+    timing = int(entry.deadline) if use_timestamps() else boost_seconds_left(entry)
+    return (position, entry.discord_user_id, entry.discord_username, entry.ingame_username, timing)
+
+class BoostsBoard:
+    def __init__(self, server_number):
+        self.server_number = server_number
+        self.pages = []  # [ticket_channel_id, ...] per page
+        self._lines = {}  # ticket_channel_id -> (signature, line)
+
+    def render(self, entries):
+        # Returns the text of every page for the given queue (in approval order)
+        by_id = {entry.ticket_channel_id: entry for entry in entries}
+        if not by_id:
+            self.pages = [[]]
+            self._lines = {}
+            return [f"{boosts_list_marker(self.server_number)}\nNo active boosts."]
+        pages = []
+        placed = set()
+        for ids in self.pages:
+            kept = [channel_id for channel_id in ids if channel_id in by_id]
+            if kept:
+                pages.append(kept)
+                placed.update(kept)
+        new = [channel_id for channel_id in by_id if channel_id not in placed]
+        if new:
+            if pages:
+                pages[-1].extend(new)
+            else:
+                pages.append(new)
+        lines = {}
+        texts, pages = self._pack(pages, by_id, lines)
+        if len(pages) > 1 and sum(len(text) for text in texts) <= (len(pages) - 2) * BOOSTS_PAGE_LIMIT:
+            # Removals left at least two pages' worth of room: lay everything out again
+            texts, pages = self._pack([list(by_id)], by_id, lines)
+        self.pages = pages
+        self._lines = lines
+        return texts
+
+    def _line(self, position, channel_id, entry, lines):
+        signature = boost_line_signature(position, entry)
+        cached = self._lines.get(channel_id) or lines.get(channel_id)
+        if cached and cached[0] == signature:
+            line = cached[1]
+        else:
+            line = format_boost_line(position, entry)
+        lines[channel_id] = (signature, line)
+        return line
+
+    def _pack(self, pages, by_id, lines):
+        # Fills the pages in order; lines that no longer fit move to the front of the next page
+        texts, packed = [], []
+        pending = deque(pages)
+        carry = []
+        while pending or carry:
+            ids = carry + (pending.popleft() if pending else [])
+            carry = []
+            header = boosts_list_marker(self.server_number, len(packed))
+            page_lines = [header]
+            size = len(header)
+            kept = []
+            for n, channel_id in enumerate(ids):
+                line = self._line(len(kept) + 1, channel_id, by_id[channel_id], lines)
+                if kept and size + 1 + len(line) > BOOSTS_PAGE_LIMIT:
+                    carry = ids[n:]
+                    break
+                page_lines.append(line)
+                size += 1 + len(line)
+                kept.append(channel_id)
+            packed.append(kept)
+            texts.append("\n".join(page_lines))
+        return texts, packed
+
+async def update_boosts_page(guild, server_number, page, content):
+    boosts_channel = boosts_channel_for(guild)
     if boosts_channel is None:
         return
-    # Compose plain-text list for this server_number
-    list_text = format_boosts_list_plaintext(server_number)
     allowed_mentions = discord.AllowedMentions(users=True)
     key = (guild.id, server_number)
-    # Find or create the pinned boosts queue message for this server_number
+    pages = boosts_pinned_message.setdefault(key, [])
+    # Edit the registered pinned message for this page without fetching it
+    registered = pages[page] if page < len(pages) else None
+    if registered and registered[0] == boosts_channel.id:
+        message = boosts_channel.get_partial_message(registered[1])
+        try:
+            # Cosmetic: a newer render of the same page replaces this edit while it is still queued
+            result = await outbound.call(
+                guild.id, "message.edit", boosts_channel.id,
+                lambda: message.edit(content=content, embed=None, allowed_mentions=allowed_mentions),
+                PRIORITY_COSMETIC, merge_key=("pinned", key, page)
+            )
+            return UNDELIVERED if result is UNDELIVERED else message
+        except discord.NotFound:
+            # Message was deleted, recreate it below
+            pass
+    # No message yet (or it was deleted, or the boosts channel changed): send one and pin it
     # We pin the message with content=list_text and NO embed
-    if key not in boosts_pinned_message or boosts_pinned_message[key] is None:
-        # Find the pinned boosts queue message with our text marker (first line is always "1. ..." or "No active boosts.")
-        found = None
-        async for msg in boosts_channel.pins():
-            if msg.author == bot.user:
-                # Check if this is the boosts list message for this server_number
-                if msg.content.startswith("1. ") or msg.content.startswith("No active boosts."):
-                    # Optionally, check if server_number is in the message (not strictly necessary if only one per server)
-                    found = msg
+    message = await outbound.call(
+        guild.id, "message.send", boosts_channel.id,
+        lambda: boosts_channel.send(content=content, allowed_mentions=allowed_mentions)
+    )
+    while len(pages) <= page:
+        pages.append(None)
+    pages[page] = (boosts_channel.id, message.id)
+    state_store.save_pinned_page(guild.id, server_number, page, message)
+    try:
+        await outbound.call(guild.id, "message.pin", boosts_channel.id, message.pin)
+    except discord.Forbidden:
+        pass
+    return message
+
+async def delete_boosts_page(guild, server_number, page):
+    # Removes a trailing page that the queue no longer needs
+    pages = boosts_pinned_message.get((guild.id, server_number), [])
+    registered = pages.pop(page) if page < len(pages) else None
+    state_store.delete_pinned_page(guild.id, server_number, page)
+    boosts_channel = boosts_channel_for(guild)
+    if registered is None or boosts_channel is None or registered[0] != boosts_channel.id:
+        return
+    message = boosts_channel.get_partial_message(registered[1])
+    try:
+        await outbound.call(guild.id, "message.delete", boosts_channel.id, message.delete)
+    except discord.NotFound:
+        pass
+
+# --- Coalesced pinned list rendering ---
+# Changes only mark a (guild.id, server_number) key dirty; the renderer edits each pinned page
+# at most once per interval, skips pages whose text is unchanged and slows down per guild when
+# Discord answers the boosts channel with 429s or an exhausted bucket (seen by http_trace; time
+# spent queued in the dispatcher is not a signal). Keys render concurrently (a bounded number at a
+# time), so one slow or backed off guild never holds up another guild's list.
+BOOSTS_RENDER_INTERVAL = float(os.getenv("BOOSTS_RENDER_INTERVAL", "5"))
+BOOSTS_RENDER_CONCURRENCY = 8
+BOOSTS_RENDER_MAX_INTERVAL = 120.0
+
+class BoostsRenderer:
+    def __init__(self, interval):
+        self.base_interval = interval
+        self._interval = {}  # guild_id -> current (possibly backed off) interval
+        self._dirty = {}  # key -> guild
+        self._boards = {}  # key -> BoostsBoard
+        self._last_pages = {}  # key -> [text of each page at its last successful edit]
+        self._last_flush = {}  # key -> time of the last render attempt
+        self._rendering = {}  # key -> task rendering it right now
+        self._slots = asyncio.Semaphore(BOOSTS_RENDER_CONCURRENCY)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def interval(self, guild_id):
+        return self._interval.get(guild_id, self.base_interval)
+
+    def mark_dirty(self, guild, server_number):
+        self._dirty[(guild.id, server_number)] = guild
+        self._wake()
+
+    def _wake(self):
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def forget(self, guild_id, server_number):
+        # Drop the cached texts so the next render always reaches Discord
+        self._last_pages.pop((guild_id, server_number), None)
+
+    def _next_allowed(self, key):
+        return self._last_flush.get(key, 0.0) + self.interval(key[0])
+
+    async def _run(self):
+        while self._dirty:
+            self._wakeup.clear()
+            t = now()
+            # A key that is still rendering waits for that render; its task wakes us when it ends
+            waiting = [key for key in self._dirty if key not in self._rendering]
+            due = [key for key in waiting if self._next_allowed(key) <= t]
+            if not due:
+                delay = min((self._next_allowed(key) for key in waiting), default=t + BOOSTS_RENDER_MAX_INTERVAL) - t
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for key in due:
+                guild = self._dirty.pop(key)
+                self._rendering[key] = asyncio.create_task(self._render_bounded(key, guild))
+
+    async def _render_bounded(self, key, guild):
+        try:
+            async with self._slots:
+                await self._render(key, guild)
+        finally:
+            del self._rendering[key]
+            if key in self._dirty:
+                self._wake()
+
+    async def _render(self, key, guild):
+        guild_id, server_number = key
+        board = self._boards.get(key)
+        if board is None:
+            board = self._boards[key] = BoostsBoard(server_number)
+        texts = board.render(boosts_queue.partition(guild_id, server_number))
+        last = self._last_pages.setdefault(key, [])
+        changed = [page for page, text in enumerate(texts) if page >= len(last) or last[page] != text]
+        if not changed and len(boosts_pinned_message.get(key, ())) <= len(texts):
+            render_calls.inc("unchanged")
+            return
+        boosts_channel = boosts_channel_for(guild)
+        channel_id = boosts_channel.id if boosts_channel else None
+        self._last_flush[key] = now()
+        timer = time.perf_counter()
+        message = None
+        dropped = False
+        try:
+            for page in changed:
+                message = await update_boosts_page(guild, server_number, page, texts[page])
+                if message is None:
                     break
-        if found:
-            boosts_pinned_message[key] = found
-            try:
-                await found.edit(content=list_text, embed=None, allowed_mentions=allowed_mentions)
-            except Exception:
-                pass
+                if message is UNDELIVERED:
+                    # The dispatcher shed the edit; keep the old text so the page is edited next time
+                    dropped = True
+                    continue
+                page_edits.inc()
+                while len(last) <= page:
+                    last.append(None)
+                last[page] = texts[page]
+            else:
+                for page in range(len(boosts_pinned_message.get(key, ())) - 1, len(texts) - 1, -1):
+                    await delete_boosts_page(guild, server_number, page)
+                del last[len(texts):]
+        except discord.HTTPException as e:
+            render_calls.inc("rate_limited" if e.status == 429 else "failed")
+            if e.status == 429:
+                retry_after = 0.0
+                if e.response is not None:
+                    retry_after = float(e.response.headers.get("Retry-After", 0) or 0)
+                channel_rate_limits.pop(channel_id, None)
+                self._back_off(guild_id, retry_after)
+                # Try again once the backed off interval has passed
+                self._dirty.setdefault(key, guild)
+            else:
+                print(f"Failed to update boosts list for ps{server_number}: {e}")
+            return
+        render_seconds.observe(time.perf_counter() - timer)
+        if dropped:
+            render_calls.inc("dropped")
+            self._dirty.setdefault(key, guild)
         else:
-            # If no pinned message, send one and pin it
-            boosts_pinned_message[key] = await boosts_channel.send(
-                content=list_text,
-                allowed_mentions=allowed_mentions
-            )
-            try:
-                await boosts_pinned_message[key].pin()
-            except discord.Forbidden:
-                pass
-    else:
-        try:
-            await boosts_pinned_message[key].edit(content=list_text, embed=None, allowed_mentions=allowed_mentions)
-        except discord.NotFound:
-            # Message was deleted, reset and recreate
-            boosts_pinned_message[key] = await boosts_channel.send(
-                content=list_text,
-                allowed_mentions=allowed_mentions
-            )
-            try:
-                await boosts_pinned_message[key].pin()
-            except discord.Forbidden:
-                pass
-    return boosts_pinned_message[key]
+            render_calls.inc("rendered" if message is not None or not changed else "skipped")
+        limited, retry_after = channel_rate_limits.pop(channel_id, (None, 0.0))
+        if limited:
+            self._back_off(guild_id, retry_after)
+        elif limited is None:
+            self._recover(guild_id)
+        else:
+            # Bucket used up without a 429: hold the current pace until it refills
+            self._hold(guild_id, retry_after)
+
+    def _back_off(self, guild_id, retry_after=0.0):
+        interval = max(self.interval(guild_id) * 2, retry_after)
+        self._interval[guild_id] = min(interval, BOOSTS_RENDER_MAX_INTERVAL)
+
+    def _hold(self, guild_id, retry_after):
+        interval = max(self.interval(guild_id), retry_after)
+        self._interval[guild_id] = min(interval, BOOSTS_RENDER_MAX_INTERVAL)
+
+    def _recover(self, guild_id):
+        interval = self.interval(guild_id)
+        if interval > self.base_interval:
+            self._interval[guild_id] = max(self.base_interval, interval * 0.75)
+
+boosts_renderer = BoostsRenderer(BOOSTS_RENDER_INTERVAL)
 
+def request_boosts_render(guild, server_number):
+    boosts_renderer.mark_dirty(guild, server_number)
 
 # --- Countdown message tracking for ticket channels ---
-ticket_countdown_messages = {}  # key: ticket_channel.id, value: discord.Message
+ticket_countdown_messages = {}  # key: ticket_channel.id, value: countdown message ID
 
-async def countdown_task(entry, guild):
-    # Real-time per-second countdown, updates Boosts pinned message and ticket channel countdown every second.
-    server_number = entry.get("server_number", 1)
-    ticket_channel = entry.get("ticket_channel")
-    countdown_message = None
+def countdown_text(entry):
+    if use_timestamps():
+        return f"⏳ Boost ends **{relative_timestamp(entry.deadline)}** (<t:{int(entry.deadline)}:f>)"
+    return f"⏳ Boost time remaining: **{seconds_to_hhmmss(boost_seconds_left(entry))}**"
+
+async def start_boost_countdown(entry, guild):
+    # Posts the countdown message in the ticket channel of a queued boost and saves the boost.
+    ticket_channel_id = entry.ticket_channel_id
+    ticket_channel = entry.ticket_channel
+    if ticket_channel is None:
+        return
     # Remove any existing countdown message for this ticket channel
-    if ticket_channel and ticket_channel.id in ticket_countdown_messages:
+    if ticket_channel_id in ticket_countdown_messages:
         try:
-            old_msg = ticket_countdown_messages[ticket_channel.id]
-            await old_msg.delete()
+            old_msg = ticket_channel.get_partial_message(ticket_countdown_messages[ticket_channel_id])
+            await outbound.call(guild.id, "message.delete", ticket_channel_id, old_msg.delete)
         except Exception:
             pass
-        del ticket_countdown_messages[ticket_channel.id]
-    # Send the initial countdown message in the ticket channel
+        ticket_countdown_messages.pop(ticket_channel_id, None)
+        state_store.delete_countdown_message(ticket_channel_id)
+    # Send the initial countdown message in the ticket channel (part of the approval, so critical)
     try:
-        countdown_message = await ticket_channel.send(
-            f"⏳ Boost time remaining: **{seconds_to_hhmmss(entry['seconds_left'])}**"
+        text = countdown_text(entry)
+        message = await outbound.call(
+            guild.id, "message.send", ticket_channel_id, lambda: ticket_channel.send(text), PRIORITY_CRITICAL
         )
-        ticket_countdown_messages[ticket_channel.id] = countdown_message
+        ticket_countdown_messages[ticket_channel_id] = message.id
+        state_store.save_countdown_message(ticket_channel_id, message.id)
     except Exception:
-        countdown_message = None
-    while entry["seconds_left"] > 0:
-        await asyncio.sleep(1)
-        entry["seconds_left"] -= 1
-        await update_boosts_message(guild, server_number)
-        # Update the countdown message in the ticket channel
-        if countdown_message:
+        pass
+    if ticket_channel_id not in boosts_queue:
+        # Cancelled (denied or closed) while the countdown message was being sent
+        ticket_countdown_messages.pop(ticket_channel_id, None)
+        state_store.delete_countdown_message(ticket_channel_id)
+        return
+    state_store.save_boost(entry)
+    schedule_countdown_refresh(entry)
+
+def cancel_boost(ticket_channel_id):
+    # Stops the timer and drops the boost from the queue; returns the removed entry (or None).
+    boost_scheduler.cancel(ticket_channel_id)
+    countdown_refresher.cancel(ticket_channel_id)
+    entry = boosts_queue.remove(ticket_channel_id)
+    if entry:
+        state_store.delete_boost(ticket_channel_id)
+    if ticket_countdown_messages.pop(ticket_channel_id, None) is not None:
+        state_store.delete_countdown_message(ticket_channel_id)
+    return entry
+
+def extend_boost(ticket_channel_id, seconds):
+    entry = boosts_queue.get(ticket_channel_id)
+    if entry is None:
+        return None
+    deadline = boost_scheduler.extend(ticket_channel_id, seconds)
+    if deadline is not None:
+        entry.deadline = deadline
+        state_store.save_boost(entry)
+    return entry
+
+async def on_boost_expired(ticket_channel_id):
+    # When the deadline passes the boost leaves the queue at once; the pinned list, the notice and the
+    # ticket channel are handled by the expiry pipeline together with everything else expiring now.
+    entry = boosts_queue.remove(ticket_channel_id)
+    if entry is None:
+        return
+    state_store.delete_boost(ticket_channel_id)
+    # The countdown message goes away with the ticket channel; just forget it
+    if ticket_countdown_messages.pop(ticket_channel_id, None) is not None:
+        state_store.delete_countdown_message(ticket_channel_id)
+    expiry_pipeline.add(entry)
+
+# --- Expiry pipeline ---
+# Boosts approved together (a whole event's worth) expire in the same second. Everything that expires
+# within EXPIRY_BATCH_WINDOW is drained as one batch: one pinned list render and one merged notice per
+# ps server, while the ticket channels go to EXPIRY_DELETE_WORKERS deletion workers. A failed delete is
+# retried with exponential backoff; after EXPIRY_DELETE_ATTEMPTS it is written to the dead_letters
+# table, counted in !botstats and tried again after the next restart.
+EXPIRY_BATCH_WINDOW = 1.0
+EXPIRY_DELETE_WORKERS = 3
+EXPIRY_DELETE_ATTEMPTS = 4
+EXPIRY_RETRY_DELAY = 5.0  # seconds before the first retry, doubled for each one after it
+NOTICE_LIMIT = 2000
+
+def expiry_notices(server_number, entries):
+    if len(entries) == 1:
+        return [f"Boost for **{entries[0].user_mention}** has expired and been removed from the queue."]
+    notices = []
+    text = f"{len(entries)} boosts have expired and been removed from the ps{server_number} queue:"
+    for entry in entries:
+        line = f"- **{entry.user_mention}**"
+        if len(text) + 1 + len(line) > NOTICE_LIMIT:
+            notices.append(text)
+            text = line
+        else:
+            text += "\n" + line
+    notices.append(text)
+    return notices
+
+class ExpiryPipeline:
+    def __init__(self):
+        self._batch = []  # entries expired since the last drain
+        self._drain_task = None
+        self._deletions = asyncio.Queue()  # (guild_id, ticket_channel_id, attempt)
+        self._workers = []
+        self._deleting = 0  # deletes the workers are running
+        self._retrying = 0  # deletes waiting out their backoff
+        self.dead_letters = 0
+
+    def pending(self):
+        return len(self._batch) + self._deletions.qsize() + self._deleting + self._retrying
+
+    def add(self, entry):
+        self._batch.append(entry)
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain_loop())
+
+    async def _drain_loop(self):
+        while self._batch:
+            await asyncio.sleep(EXPIRY_BATCH_WINDOW)
+            batch, self._batch = self._batch, []
             try:
-                await countdown_message.edit(
-                    content=f"⏳ Boost time remaining: **{seconds_to_hhmmss(entry['seconds_left'])}**"
-                )
-            except (discord.NotFound, discord.Forbidden):
-                countdown_message = None
-                if ticket_channel and ticket_channel.id in ticket_countdown_messages:
-                    del ticket_countdown_messages[ticket_channel.id]
-    # When seconds_left reaches 0: remove from boosts_queue, update message, delete ticket channel, notify.
-    if entry in boosts_queue:
-        boosts_queue.remove(entry)
-    await update_boosts_message(guild, server_number)
-    boosts_channel = discord.utils.get(guild.text_channels, name=BOOSTS_CHANNEL_NAME)
-    user_mention = f"<@{entry['discord_user_id']}>" if entry.get('discord_user_id') else entry['discord_username']
-    if boosts_channel:
-        await boosts_channel.send(f"Boost for **{user_mention}** has expired and been removed from the queue.")
-    # Delete the countdown message in the ticket channel (if not already gone)
-    if ticket_channel and ticket_channel.id in ticket_countdown_messages:
+                await self._drain(batch)
+            except Exception as e:
+                print(f"Failed to clean up {len(batch)} expired boost(s): {e}")
+
+    async def _drain(self, batch):
+        servers = {}
+        for entry in batch:
+            servers.setdefault((entry.guild_id, entry.server_number), []).append(entry)
+        notices = []
+        for (guild_id, server_number), entries in servers.items():
+            guild = resolve_guild(guild_id)
+            if guild is None:
+                # The bot left the guild, and its channels with it
+                continue
+            request_boosts_render(guild, server_number)
+            for entry in entries:
+                self.delete_channel(guild_id, entry.ticket_channel_id)
+            boosts_channel = boosts_channel_for(guild)
+            if boosts_channel:
+                notices += [(guild_id, boosts_channel, text) for text in expiry_notices(server_number, entries)]
+        for guild_id, boosts_channel, text in notices:
+            try:
+                await outbound.call(guild_id, "message.send", boosts_channel.id, lambda: boosts_channel.send(text), PRIORITY_CRITICAL)
+            except Exception as e:
+                print(f"Failed to post an expiry notice in {boosts_channel.id}: {e}")
+
+    def delete_channel(self, guild_id, ticket_channel_id, attempt=1):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._delete_worker()) for _ in range(EXPIRY_DELETE_WORKERS)]
+        self._deletions.put_nowait((guild_id, ticket_channel_id, attempt))
+
+    async def _delete_worker(self):
+        while True:
+            guild_id, ticket_channel_id, attempt = await self._deletions.get()
+            ticket_channel = resolve_channel(ticket_channel_id, guild_id)
+            if ticket_channel is None:
+                expiry_deletes.inc("gone")
+                continue
+            self._deleting += 1
+            try:
+                recycled = await dispose_ticket_channel(guild_id, ticket_channel)
+                expiry_deletes.inc("recycled" if recycled else "deleted")
+            except discord.NotFound:
+                expiry_deletes.inc("gone")
+            except Exception as e:
+                self._failed(guild_id, ticket_channel_id, attempt, e)
+            finally:
+                self._deleting -= 1
+
+    def _failed(self, guild_id, ticket_channel_id, attempt, error):
+        # Missing permissions won't fix themselves, so those aren't retried
+        if attempt < EXPIRY_DELETE_ATTEMPTS and not isinstance(error, discord.Forbidden):
+            expiry_deletes.inc("retried")
+            self._retrying += 1
+            delay = EXPIRY_RETRY_DELAY * 2 ** (attempt - 1)
+            asyncio.get_running_loop().call_later(delay, self._retry, guild_id, ticket_channel_id, attempt + 1)
+            return
+        expiry_deletes.inc("dead_letter")
+        self.dead_letters += 1
+        state_store.save_dead_letter(ticket_channel_id, guild_id, attempt, str(error) or type(error).__name__, now())
+        print(f"Gave up deleting ticket channel {ticket_channel_id} after {attempt} attempt(s): {error}")
+
+    def _retry(self, guild_id, ticket_channel_id, attempt):
+        self._retrying -= 1
+        self.delete_channel(guild_id, ticket_channel_id, attempt)
+
+expiry_pipeline = ExpiryPipeline()
+boost_scheduler = DeadlineScheduler(on_boost_expired)
+
+# --- Countdown refresh ---
+# Countdown messages are edited when their deadline changes, and in plaintext mode also on the
+# adaptive cadence from countdown_refresh_interval, driven by one shared deadline scheduler.
+# Only the cadence edits are cosmetic: the next tick repairs a dropped one, but nothing repairs a
+# dropped deadline change (in timestamp mode it is the only edit the message ever gets).
+async def refresh_countdown(ticket_channel_id, deadline_changed=False):
+    entry = boosts_queue.get(ticket_channel_id)
+    if entry is None:
+        return
+    ticket_channel = entry.ticket_channel
+    countdown_message_id = ticket_countdown_messages.get(ticket_channel_id)
+    if countdown_message_id is not None and ticket_channel is not None:
+        countdown_message = ticket_channel.get_partial_message(countdown_message_id)
         try:
-            msg = ticket_countdown_messages[ticket_channel.id]
-            await msg.delete()
+            text = countdown_text(entry)
+            if deadline_changed:
+                await outbound.call(
+                    entry.guild_id, "message.edit", ticket_channel_id, lambda: countdown_message.edit(content=text)
+                )
+            else:
+                await outbound.call(
+                    entry.guild_id, "message.edit", ticket_channel_id,
+                    lambda: countdown_message.edit(content=text),
+                    PRIORITY_COSMETIC, merge_key=("countdown", ticket_channel_id)
+                )
+        except (discord.NotFound, discord.Forbidden):
+            ticket_countdown_messages.pop(ticket_channel_id, None)
+            state_store.delete_countdown_message(ticket_channel_id)
         except Exception:
             pass
-        del ticket_countdown_messages[ticket_channel.id]
-    # Delete the ticket channel if it still exists
-    if ticket_channel:
+    guild = resolve_guild(entry.guild_id)
+    if guild is not None:
+        request_boosts_render(guild, entry.server_number)
+    schedule_countdown_refresh(entry)
+
+countdown_refresher = DeadlineScheduler(refresh_countdown)
+
+def schedule_countdown_refresh(entry):
+    ticket_channel_id = entry.ticket_channel_id
+    seconds_left = boost_seconds_left(entry)
+    if use_timestamps() or seconds_left <= 0:
+        countdown_refresher.cancel(ticket_channel_id)
+        return
+    countdown_refresher.schedule(ticket_channel_id, now() + min(countdown_refresh_interval(seconds_left), seconds_left))
+
+# --- Scheduler worker link ---
+# In sharded deployments every guild lives on exactly one shard process (BOT_MODE=shard), but boost
+# deadlines, countdown messages and the pinned lists need a single owner: the scheduler worker
+# (BOT_MODE=scheduler). Shards send boost events to it as JSON lines over a Unix socket and the
+# worker applies them in arrival order. The worker only talks to Discord over REST, through channel
+# handles built from IDs, so it needs no gateway connection of its own. Run it next to the shards:
+#   BOT_MODE=scheduler python bot.py
+#   BOT_MODE=shard SHARD_COUNT=2 SHARD_IDS=0 python bot.py
+#   BOT_MODE=shard SHARD_COUNT=2 SHARD_IDS=1 python bot.py
+BOT_IPC_PATH = os.getenv("BOT_IPC_PATH", "bot_scheduler.sock")
+IPC_BACKLOG_LIMIT = 10000  # events a shard keeps while the worker is unreachable
+IPC_DROPPABLE_OPS = ("pinned_deleted",)  # hints the worker can do without; every other op changes boost state
+IPC_REQUEST_TIMEOUT = 10.0
+
+class RemoteChannel:
+    # Channel handle for the scheduler worker, which has no channel cache
+    def __init__(self, channel_id, guild_id):
+        self.id = channel_id
+        self.guild = discord.Object(id=guild_id)
+        self._messageable = bot.get_partial_messageable(channel_id, guild_id=guild_id)
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, **kwargs):
+        return await self._messageable.send(content, **kwargs)
+
+    def get_partial_message(self, message_id):
+        return self._messageable.get_partial_message(message_id)
+
+    async def delete(self):
+        await bot.http.delete_channel(self.id)
+
+remote_boosts_channels = {}  # guild_id -> boosts channel ID, as reported by the shards (worker only)
+
+def boosts_channel_for(guild):
+    if BOT_MODE == "scheduler":
+        channel_id = remote_boosts_channels.get(guild.id)
+        return RemoteChannel(channel_id, guild.id) if channel_id else None
+    return entity_cache.text_channel(guild, BOOSTS_CHANNEL_NAME)
+
+class SchedulerUnavailable(Exception):
+    pass
+
+class SchedulerLink:
+    # Shard side of the link. Events are buffered while the worker is unreachable and written once
+    # the connection is (re)established; request() waits for the worker's reply. A full backlog only
+    # sheds droppable hints: boost state changes are kept even past the limit.
+    def __init__(self, path):
+        self.path = path
+        self._backlog = deque()  # (op, encoded line) not written yet
+        self._requests = {}  # request id -> future
+        self._ids = itertools.count(1)
+        self._writer = None
+        self._task = None
+        self.dropped = 0
+
+    def backlog(self):
+        return len(self._backlog)
+
+    def send(self, op, **fields):
+        if len(self._backlog) >= IPC_BACKLOG_LIMIT:
+            stale = next((n for n, (queued, _) in enumerate(self._backlog) if queued in IPC_DROPPABLE_OPS), None)
+            if stale is not None:
+                del self._backlog[stale]
+                self.dropped += 1
+            elif op in IPC_DROPPABLE_OPS:
+                self.dropped += 1
+                return
+            elif len(self._backlog) == IPC_BACKLOG_LIMIT:
+                print(f"Scheduler worker backlog passed {IPC_BACKLOG_LIMIT} events; keeping boost events until it is reachable")
+        entry = (op, json.dumps({"op": op, **fields}).encode() + b"\n")
+        self._backlog.append(entry)
+        self._flush()
+        return entry
+
+    async def request(self, op, **fields):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        entry = self.send(op, id=request_id, **fields)
         try:
-            await ticket_channel.delete()
-        except discord.NotFound:
-            pass
-        except Exception:
-            pass
+            return await asyncio.wait_for(future, timeout=IPC_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Never leave an unanswered request behind to be applied once the worker is back
+            if entry in self._backlog:
+                self._backlog.remove(entry)
+                raise SchedulerUnavailable("The scheduler worker is unreachable, so nothing was changed. Try again later.")
+            raise SchedulerUnavailable(
+                "The scheduler worker didn't answer in time. The change may still be applied; check the boosts list before retrying."
+            )
+        finally:
+            self._requests.pop(request_id, None)
 
-# --- Ticket deletion countdown with cancellation if user responds ---
-# Only used for inactivity before approval.
-ticket_deletion_tasks = {}  # key: channel_id, value: (task, author_id)
+    def connect(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _flush(self):
+        self.connect()
+        if self._writer is None:
+            return
+        while self._backlog:
+            self._writer.write(self._backlog.popleft()[1])
 
-async def ticket_deletion_countdown(ticket_channel, opener_id):
+    async def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                print(f"Scheduler worker not reachable at {self.path} ({e}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            delay = 1.0
+            self._writer = writer
+            self._flush()
+            try:
+                while line := await reader.readline():
+                    reply = json.loads(line)
+                    future = self._requests.get(reply.get("id"))
+                    if future is None or future.done():
+                        continue
+                    if "error" in reply:
+                        future.set_exception(RuntimeError(reply["error"]))
+                    else:
+                        future.set_result(reply.get("result"))
+            except (OSError, ValueError) as e:
+                print(f"Scheduler worker link failed: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+            print("Lost the connection to the scheduler worker, reconnecting...")
+
+scheduler_link = SchedulerLink(BOT_IPC_PATH)
+if BOT_MODE == "shard":
+    metrics.gauge("bot_ipc_backlog", "Events waiting for the scheduler worker.", (), lambda: {(): scheduler_link.backlog()})
+    metrics.gauge("bot_ipc_dropped_total", "Droppable events shed from a full scheduler backlog.", (),
+                  lambda: {(): scheduler_link.dropped}, kind="counter")
+
+# -- Boost operations used by the handlers: applied locally, or forwarded to the worker by shards --
+def queue_boost(entry, guild):
+    # Synchronous, so a cancel or extend that arrives right after sees the boost and its deadline
+    boosts_queue.add(entry)
+    boost_scheduler.schedule(entry.ticket_channel_id, entry.deadline)
+    request_boosts_render(guild, entry.server_number)
+
+async def approve_boost(entry, guild, boosts_channel):
+    if BOT_MODE == "shard":
+        scheduler_link.send("boost_start", boosts_channel_id=boosts_channel.id, **entry.record())
+        return
+    # Schedule the expiry (this will delete the ticket channel on expiry) and post the live countdown
+    queue_boost(entry, guild)
+    await start_boost_countdown(entry, guild)
+
+def close_boost(ticket_channel_id, guild):
+    if BOT_MODE == "shard":
+        scheduler_link.send("boost_cancel", guild_id=guild.id, ticket_channel_id=ticket_channel_id)
+        return
+    removed = cancel_boost(ticket_channel_id)
+    if removed:
+        request_boosts_render(guild, removed.server_number)
+
+async def extend_boost_by(ticket_channel_id, guild, seconds):
+    # Returns the new deadline, or None if the ticket has no running boost
+    if BOT_MODE == "shard":
+        return await scheduler_link.request("boost_extend", guild_id=guild.id, ticket_channel_id=ticket_channel_id, seconds=seconds)
+    entry = extend_boost(ticket_channel_id, seconds)
+    if entry is None:
+        return None
+    # The deadline changed, so the countdown message and pinned list need one edit each
+    await refresh_countdown(ticket_channel_id, deadline_changed=True)
+    return entry.deadline
+
+def boosted_channel_ids(guild_id, server_number):
+    return [entry.ticket_channel_id for entry in boosts_queue.partition(guild_id, server_number)]
+
+def extend_server_boosts(guild, server_number, seconds):
+    # Moves every deadline on the server in one pass; the countdown edits and the single pinned
+    # render are queued behind it. Returns the number of boosts extended.
+    extended = 0
+    for entry in boosts_queue.partition(guild.id, server_number):
+        if extend_boost(entry.ticket_channel_id, seconds) is not None:
+            spawn_worker_task(refresh_countdown(entry.ticket_channel_id, deadline_changed=True))
+            extended += 1
+    return extended
+
+async def server_boosts(guild, server_number):
+    # Ticket channel IDs with a running boost on one ps server
+    if BOT_MODE == "shard":
+        return set(await scheduler_link.request("boost_channels", guild_id=guild.id, server_number=server_number))
+    return set(boosted_channel_ids(guild.id, server_number))
+
+async def extend_all_boosts(guild, server_number, seconds):
+    if BOT_MODE == "shard":
+        return await scheduler_link.request("boost_extend_server", guild_id=guild.id, server_number=server_number, seconds=seconds)
+    return extend_server_boosts(guild, server_number, seconds)
+
+def forget_pinned_message(guild_id, message_id):
+    if BOT_MODE == "shard":
+        scheduler_link.send("pinned_deleted", guild_id=guild_id, message_id=message_id)
+        return
+    for key, pages in boosts_pinned_message.items():
+        page = next((n for n, registered in enumerate(pages) if registered and registered[1] == message_id), None)
+        if page is not None:
+            pages[page] = None
+            boosts_renderer.forget(*key)
+            guild = resolve_guild(key[0])
+            if guild is not None:
+                request_boosts_render(guild, key[1])
+
+# -- Worker side: apply shard events --
+worker_tasks = set()
+
+def spawn_worker_task(coro):
+    task = asyncio.create_task(coro)
+    worker_tasks.add(task)
+    task.add_done_callback(worker_tasks.discard)
+
+def handle_shard_event(message):
+    # State changes happen synchronously, in arrival order; REST work runs in the background
+    op = message["op"]
+    guild = discord.Object(id=message["guild_id"])
+    if message.get("boosts_channel_id"):
+        remote_boosts_channels[guild.id] = message["boosts_channel_id"]
+    if op == "boost_start":
+        entry = BoostEntry.from_record(message)
+        queue_boost(entry, guild)
+        spawn_worker_task(start_boost_countdown(entry, guild))
+    elif op == "boost_cancel":
+        close_boost(message["ticket_channel_id"], guild)
+    elif op == "boost_extend":
+        entry = extend_boost(message["ticket_channel_id"], message["seconds"])
+        if entry is None:
+            return None
+        spawn_worker_task(refresh_countdown(message["ticket_channel_id"], deadline_changed=True))
+        return entry.deadline
+    elif op == "boost_extend_server":
+        return extend_server_boosts(guild, message["server_number"], message["seconds"])
+    elif op == "boost_channels":
+        return boosted_channel_ids(guild.id, message["server_number"])
+    elif op == "pinned_deleted":
+        forget_pinned_message(guild.id, message["message_id"])
+    else:
+        raise ValueError(f"unknown op {op!r}")
+    return None
+
+async def serve_shard(reader, writer):
+    try:
+        while line := await reader.readline():
+            message = json.loads(line)
+            try:
+                reply = {"result": handle_shard_event(message)}
+            except Exception as e:
+                print(f"Failed to handle {message.get('op')!r} from a shard: {e}")
+                reply = {"error": str(e)}
+            if "id" in message:
+                writer.write(json.dumps({"id": message["id"], **reply}).encode() + b"\n")
+    except (OSError, ValueError) as e:
+        print(f"Shard connection failed: {e}")
+    finally:
+        writer.close()
+
+async def run_scheduler_worker():
+    discord.utils.setup_logging()
+    async with bot:
+        await bot.login(TOKEN)
+        await restore_state()
+        await start_metrics()
+        if os.path.exists(BOT_IPC_PATH):
+            # Left behind by a previous run
+            os.unlink(BOT_IPC_PATH)
+        server = await asyncio.start_unix_server(serve_shard, BOT_IPC_PATH)
+        print(f"Scheduler worker listening on {BOT_IPC_PATH}")
+        async with server:
+            await server.serve_forever()
+
+# --- Ticket inactivity timers ---
+# Only used for inactivity before approval. Every pending ticket's deletion deadline lives in one
+# DeadlineScheduler; on_message cancels or extends it with a single dict lookup by channel ID.
+# In plaintext mode the scheduled time is the next refresh of the notice, and the ticket is only
+# deleted once the real deadline has passed.
+TICKET_INACTIVITY_TIMEOUT = int(os.getenv("TICKET_INACTIVITY_TIMEOUT", "60"))
+TICKET_FORM_TIMEOUT = 300  # how long the intake form stays open, and keeps the ticket alive once opened
+inactivity_timeouts = {}  # guild_id -> seconds, overrides TICKET_INACTIVITY_TIMEOUT
+pending_inactivity = {}  # channel_id -> {"channel", "opener_id", "deadline", "message"}
+
+def inactivity_timeout(guild_id):
+    return inactivity_timeouts.get(guild_id, TICKET_INACTIVITY_TIMEOUT)
+
+def inactivity_text(deadline):
+    if use_timestamps():
+        return f"This ticket will be deleted {relative_timestamp(deadline)} if there is no reply from the ticket opener."
+    seconds_left = max(0, int(deadline - now() + 0.999))
+    return f"This ticket will be deleted in {seconds_left} seconds if there is no reply from the ticket opener."
+
+def schedule_inactivity_check(channel_id):
+    deadline = pending_inactivity[channel_id]["deadline"]
+    seconds_left = deadline - now()
+    if use_timestamps() or seconds_left <= 0:
+        inactivity_timers.schedule(channel_id, deadline)
+    else:
+        inactivity_timers.schedule(channel_id, now() + min(countdown_refresh_interval(int(seconds_left + 0.999)), seconds_left))
+
+async def start_inactivity_timer(ticket_channel, opener_id):
+    deadline = now() + inactivity_timeout(ticket_channel.guild.id)
+    info = {"channel": ticket_channel, "opener_id": opener_id, "deadline": deadline, "message": None}
+    pending_inactivity[ticket_channel.id] = info
+    schedule_inactivity_check(ticket_channel.id)
+    state_store.save_inactivity_deadline(ticket_channel.id, info)
+    try:
+        text = inactivity_text(deadline)
+        info["message"] = await outbound.call(ticket_channel.guild.id, "message.send", ticket_channel.id, lambda: ticket_channel.send(text))
+    except Exception:
+        return
+    if pending_inactivity.get(ticket_channel.id) is info:
+        state_store.save_inactivity_deadline(ticket_channel.id, info)
+
+def cancel_inactivity_timer(channel_id):
+    inactivity_timers.cancel(channel_id)
+    info = pending_inactivity.pop(channel_id, None)
+    if info is not None:
+        state_store.delete_inactivity_deadline(channel_id)
+    return info
+
+async def extend_inactivity_timer(channel_id, seconds=None):
+    # Someone is active in the ticket; push the deadline back to a full timeout (or `seconds`)
+    info = pending_inactivity.get(channel_id)
+    if info is None:
+        return
+    info["deadline"] = now() + max(inactivity_timeout(info["channel"].guild.id), seconds or 0)
+    schedule_inactivity_check(channel_id)
+    state_store.save_inactivity_deadline(channel_id, info)
+    if use_timestamps() and info["message"] is not None:
+        await edit_inactivity_notice(channel_id, info)
+
+async def edit_inactivity_notice(channel_id, info):
+    text = inactivity_text(info["deadline"])
+    message = info["message"]
+    try:
+        await outbound.call(
+            info["channel"].guild.id, "message.edit", channel_id,
+            lambda: message.edit(content=text),
+            PRIORITY_COSMETIC, merge_key=("inactivity", channel_id)
+        )
+    except discord.NotFound:
+        info["message"] = None
+    except Exception:
+        pass
+
+async def on_inactivity_check(channel_id):
+    info = pending_inactivity.get(channel_id)
+    if info is None:
+        return
+    if now() < info["deadline"]:
+        # Plaintext refresh of the notice
+        schedule_inactivity_check(channel_id)
+        if info["message"] is not None:
+            await edit_inactivity_notice(channel_id, info)
+        return
+    del pending_inactivity[channel_id]
+    state_store.delete_inactivity_deadline(channel_id)
+    # Delete the ticket channel if it still exists
     try:
-        countdown_message = await ticket_channel.send("This ticket will be deleted in 60 seconds if there is no reply from the ticket opener.")
-        seconds_left = 60
-        while seconds_left > 0:
-            await asyncio.sleep(1)
-            seconds_left -= 1
-            try:
-                await countdown_message.edit(content=f"This ticket will be deleted in {seconds_left} seconds if there is no reply from the ticket opener.")
-            except discord.NotFound:
-                break
-            # Check if the task is still the same (not cancelled)
-            task_info = ticket_deletion_tasks.get(ticket_channel.id)
-            if not task_info or task_info[0].cancelled():
-                # Task cancelled, exit
-                return
-        # Delete the ticket channel if it still exists
-        await ticket_channel.delete()
+        await dispose_ticket_channel(info["channel"].guild.id, info["channel"])
     except discord.NotFound:
         pass
     except Exception:
         pass
 
+inactivity_timers = DeadlineScheduler(on_inactivity_check)
+
+# --- Member lookup index ---
+# Resolves the username typed into a ticket to a guild member without scanning guild.members.
+# Usernames, legacy name#discrim tags and IDs are unique; global and display names are not, so
+# those can come back ambiguous. With MEMBER_CACHE=off there is no member list to index, so each
+# lookup asks the gateway for the members whose names start with the text and matches those.
+MENTION_RE = re.compile(r"<@!?(\d+)>")
+MEMBER_QUERY_LIMIT = 25
+
+class MemberIndex:
+    def __init__(self):
+        self._unique = {}  # guild_id -> {username / name#discrim / id: member_id}
+        self._names = {}  # guild_id -> {global name / display name: set of member_ids}
+        self._keys = {}  # (guild_id, member_id) -> (unique keys, name keys) currently indexed
+        self._complete = set()  # guild IDs indexed after the member list was fully chunked
+
+    @staticmethod
+    def _member_keys(member):
+        unique = {member.name.lower(), str(member.id)}
+        if member.discriminator and member.discriminator != "0":
+            unique.add(f"{member.name}#{member.discriminator}".lower())
+        names = {member.display_name.lower()}
+        if member.global_name:
+            names.add(member.global_name.lower())
+        return unique, names
+
+    def _ensure(self, guild):
+        if guild.id in self._complete:
+            return
+        self._unique[guild.id] = {}
+        self._names[guild.id] = {}
+        for member in guild.members:
+            self.add(member)
+        # Build again on the next lookup if the member list was still being chunked
+        if guild.chunked:
+            self._complete.add(guild.id)
+
+    def add(self, member):
+        guild_id = member.guild.id
+        if guild_id not in self._unique:
+            # Not indexed yet; the whole guild is indexed on first lookup
+            return
+        self.remove(member)
+        unique, names = self._member_keys(member)
+        for key in unique:
+            self._unique[guild_id][key] = member.id
+        for key in names:
+            self._names[guild_id].setdefault(key, set()).add(member.id)
+        self._keys[(guild_id, member.id)] = (unique, names)
+
+    def remove(self, member):
+        guild_id = member.guild.id
+        keys = self._keys.pop((guild_id, member.id), None)
+        if keys is None:
+            return
+        unique, names = keys
+        for key in unique:
+            if self._unique[guild_id].get(key) == member.id:
+                del self._unique[guild_id][key]
+        for key in names:
+            ids = self._names[guild_id].get(key)
+            if ids:
+                ids.discard(member.id)
+                if not ids:
+                    del self._names[guild_id][key]
+
+    def forget_guild(self, guild_id):
+        self._unique.pop(guild_id, None)
+        self._names.pop(guild_id, None)
+        self._complete.discard(guild_id)
+        self._keys = {key: value for key, value in self._keys.items() if key[0] != guild_id}
+
+    def resolve(self, guild, text):
+        # Returns the matching members: one for a clear match, several when the name is ambiguous.
+        self._ensure(guild)
+        text = text.strip()
+        mention = MENTION_RE.fullmatch(text)
+        key = mention.group(1) if mention else text.lstrip("@").lower()
+        member_id = self._unique[guild.id].get(key)
+        if member_id is not None:
+            member_ids = {member_id}
+        else:
+            member_ids = self._names[guild.id].get(key, set())
+        members = [guild.get_member(member_id) for member_id in member_ids]
+        return [member for member in members if member is not None]
+
+    async def lookup(self, guild, text):
+        if MEMBER_CACHE:
+            return self.resolve(guild, text)
+        text = text.strip()
+        mention = MENTION_RE.fullmatch(text)
+        key = mention.group(1) if mention else text.lstrip("@").lower()
+        if not key:
+            return []
+        try:
+            if key.isdigit():
+                candidates = await guild.query_members(user_ids=[int(key)], cache=False)
+            else:
+                query = key.split("#")[0]
+                if not query:
+                    # "#1234" alone names nobody, and query_members rejects an empty query
+                    return []
+                candidates = await guild.query_members(query=query, limit=MEMBER_QUERY_LIMIT, cache=False)
+        except asyncio.TimeoutError:
+            print(f"Member query for '{text}' in {guild.name} timed out")
+            return []
+        keys = [(member, self._member_keys(member)) for member in candidates]
+        unique = [member for member, (unique_keys, _) in keys if key in unique_keys]
+        if unique:
+            return unique[:1]
+        return [member for member, (_, name_keys) in keys if key in name_keys]
+
+member_index = MemberIndex()
+
+pending_approvals = {}  # ticket channel ID -> TicketView whose summary still waits for Approve/Deny
+
+def forget_pending_approval(ticket_channel_id):
+    if pending_approvals.pop(ticket_channel_id, None) is not None:
+        state_store.delete_pending_approval(ticket_channel_id)
+
+class TicketClosedError(Exception):
+    pass
+
 class TicketView(discord.ui.View):
+    # Persistent: the buttons carry the ticket channel ID, so restore_state can re-register the
+    # view of a summary that was still pending when the bot restarted
     def __init__(self, author, discord_username, ingame_username, hours_left, ticket_channel, server_number):
         super().__init__(timeout=None)
-        self.author = author
+        self.approve.custom_id = f"ticket:approve:{ticket_channel.id}"
+        self.deny.custom_id = f"ticket:deny:{ticket_channel.id}"
+        # Only IDs are kept; pending summaries can wait for hours
+        self.author_id = author.id
         self.discord_username = discord_username
         self.ingame_username = ingame_username
         self.hours_left = hours_left
-        self.ticket_channel = ticket_channel
+        self.ticket_channel_id = ticket_channel.id
+        self.guild_id = ticket_channel.guild.id
         self.server_number = server_number
+        self.message = None  # the summary message carrying this view
+        self.decided = False  # approved or denied
+        self.approving = False  # an approval is being queued
+
+    @property
+    def ticket_channel(self):
+        return resolve_channel(self.ticket_channel_id, self.guild_id)
+
+    def row(self):
+        return (
+            self.ticket_channel_id, self.guild_id, self.server_number, self.author_id,
+            self.discord_username, self.ingame_username, self.hours_left, self.message.id
+        )
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         # Only allow Trial Moderators to interact
@@ -222,329 +2312,1034 @@ class TicketView(discord.ui.View):
         if guild is None:
             await interaction.response.send_message("Guild context not found.", ephemeral=True)
             return False
-        trial_mod_role = discord.utils.get(guild.roles, name=TRIAL_MOD_ROLE_NAME)
-        if trial_mod_role in interaction.user.roles:
+        trial_mod_role = entity_cache.role(guild, TRIAL_MOD_ROLE_NAME)
+        if trial_mod_role and interaction.user.get_role(trial_mod_role.id):
             return True
         await interaction.response.send_message("You do not have permission to use this.", ephemeral=True)
         return False
 
+    def valid_hours(self):
+        # Hours Remaining as a positive integer, or None
+        try:
+            hours = int(self.hours_left)
+        except ValueError:
+            return None
+        return hours if hours > 0 else None
+
+    def open_for_approval(self):
+        return not self.decided and not self.approving
+
+    async def accept(self, guild, boosts_channel):
+        # Queues the boost and starts its countdown. Returns a note for the approver ("" if none);
+        # raises ValueError when Hours Remaining is not a positive integer, and TicketClosedError
+        # when the ticket went away during the member lookup. The ticket only counts as decided
+        # once the boost is queued, so a failed approval can be retried.
+        hours_int = self.valid_hours()
+        if hours_int is None:
+            raise ValueError(self.hours_left)
+        self.approving = True
+        generation = warm_pool.generation(self.ticket_channel_id)
+        try:
+            ambiguous_note = await self._queue_boost(guild, boosts_channel, hours_int, generation)
+        finally:
+            self.approving = False
+        self.decided = True
+        forget_pending_approval(self.ticket_channel_id)
+        return ambiguous_note
+
+    async def _queue_boost(self, guild, boosts_channel, hours_int, generation):
+        # Attempt to fetch the user by discord_username mention or name in guild members
+        member = None
+        ambiguous_note = ""
+        matches = await member_index.lookup(guild, self.discord_username)
+        if len(matches) == 1:
+            member = matches[0]
+        elif matches:
+            # Don't guess between several members sharing this name
+            candidates = ", ".join(str(m) for m in matches[:5])
+            ambiguous_note = f"\nNote: '{self.discord_username}' matches several members ({candidates}), so the boost is not linked to a member."
+
+        if self.decided or self.ticket_channel is None or warm_pool.generation(self.ticket_channel_id) != generation:
+            # Closed while the member lookup was waiting on the gateway
+            raise TicketClosedError(self.ticket_channel_id)
+
+        # Instead of sending a new message, just add to boosts_queue and update pinned message
+        entry = BoostEntry(
+            self.ticket_channel_id, self.guild_id, self.server_number, self.discord_username,
+            member.id if member else None, self.ingame_username, self.author_id, now() + hours_int * 3600
+        )
+        # Queue it, update the pinned boosts list for this server_number and start the countdown
+        await approve_boost(entry, guild, boosts_channel)
+        return ambiguous_note
+
     @discord.ui.button(label="Approve ✅", style=discord.ButtonStyle.success)
+    @instrumented("button", "approve")
     async def approve(self, interaction: discord.Interaction, button: discord.ui.Button):
         guild = interaction.guild
         if guild is None:
             await interaction.response.send_message("Guild context not found.", ephemeral=True)
             return
+        if not self.open_for_approval():
+            await interaction.response.send_message("This ticket has already been handled.", ephemeral=True)
+            return
 
-        boosts_channel = discord.utils.get(guild.text_channels, name=BOOSTS_CHANNEL_NAME)
+        boosts_channel = entity_cache.text_channel(guild, BOOSTS_CHANNEL_NAME)
         if boosts_channel is None:
             await interaction.response.send_message(f"Boosts channel '{BOOSTS_CHANNEL_NAME}' not found.", ephemeral=True)
             return
 
-        # Validate hours_left is integer
-        try:
-            hours_int = int(self.hours_left)
-            if hours_int <= 0:
-                raise ValueError
-        except ValueError:
+        if self.valid_hours() is None:
             await interaction.response.send_message("Hours Remaining must be a positive integer. Please deny and ask the user to create the ticket again with correct input.", ephemeral=True)
             return
+        # The member query and the countdown message can take longer than Discord's 3 seconds
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            ambiguous_note = await self.accept(guild, boosts_channel)
+        except TicketClosedError:
+            await interaction.followup.send("This ticket was closed before the approval went through.", ephemeral=True)
+            return
 
-        # Send embed to boosts channel and ping the user
-        embed = discord.Embed(title="Ticket Approved", color=discord.Color.green())
-        embed.add_field(name="Discord Username", value=self.discord_username, inline=False)
-        embed.add_field(name="Username (not display name)", value=self.ingame_username, inline=False)
-        embed.add_field(name="Hours Remaining", value=str(hours_int), inline=False)
-        embed.set_footer(text=f"Ticket opened by {self.author} | Approved by {interaction.user}")
-
-        # Attempt to fetch the user by discord_username mention or name in guild members
-        user_mention = None
-        member = None
-        for m in guild.members:
-            if str(m) == self.discord_username or m.name == self.discord_username or m.display_name == self.discord_username:
-                member = m
-                break
-        if member:
-            user_mention = member.mention
-            discord_user_id = member.id
-        else:
-            # fallback to just the username string
-            user_mention = self.discord_username
-            discord_user_id = None
-
-        # Instead of sending a new message, just add to boosts_queue and update pinned message
-        entry = {
-            "author": self.author,
-            "discord_username": self.discord_username,
-            "discord_user_id": discord_user_id,
-            "ingame_username": self.ingame_username,
-            "seconds_left": hours_int * 3600,
-            "ticket_channel": self.ticket_channel,
-            "task": None,
-            "server_number": self.server_number
-        }
-        boosts_queue.append(entry)
-
-        # Update the pinned boosts queue message for this server_number
-        await update_boosts_message(guild, self.server_number)
-
-        # Start countdown task (this will delete the ticket channel on expiry AND update the ticket with live countdown)
-        entry["task"] = asyncio.create_task(countdown_task(entry, guild))
-
-        await interaction.response.send_message("Ticket approved and details added to Boosts queue. A live countdown has started in this ticket channel.", ephemeral=True)
+        await interaction.followup.send("Ticket approved and details added to Boosts queue. A live countdown has started in this ticket channel." + ambiguous_note, ephemeral=True)
 
         self.clear_items()
         await interaction.message.edit(view=self)
 
     @discord.ui.button(label="Deny ❌", style=discord.ButtonStyle.danger)
+    @instrumented("button", "deny")
     async def deny(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.approving:
+            await interaction.response.send_message("This ticket is being approved right now. Close it once the approval is done.", ephemeral=True)
+            return
+        self.decided = True
+        forget_pending_approval(self.ticket_channel_id)
         await interaction.response.send_message("Ticket denied and channel will be deleted.", ephemeral=True)
-        # Cancel any countdown task if exists for this ticket
-        to_remove = None
-        for entry in boosts_queue:
-            if entry["ticket_channel"] == self.ticket_channel:
-                if entry["task"]:
-                    entry["task"].cancel()
-                to_remove = entry
-                break
-        if to_remove:
-            boosts_queue.remove(to_remove)
-            await update_boosts_message(interaction.guild, to_remove.get("server_number", 1))
-        await self.ticket_channel.delete()
+        # Cancel the boost timer if this ticket was already approved
+        close_boost(self.ticket_channel_id, interaction.guild)
+        ticket_channel = self.ticket_channel
+        if ticket_channel is not None:
+            await dispose_ticket_channel(self.guild_id, ticket_channel)
+
+state_restored = False
+
+async def restore_state():
+    # Rebuild queues, ticket numbers and message references from the state store in one bulk load.
+    # Messages are restored as partial messages from their stored IDs, so nothing is re-fetched.
+    # Shards restore the tickets of their own guilds; boosts belong to whoever runs the deadlines.
+    state = await asyncio.to_thread(state_store.load)
+    for guild_id, seconds in state["guild_settings"]:
+        if seconds:
+            inactivity_timeouts[guild_id] = seconds
+    tickets = 0
+    for channel_id, guild_id, server_number, ticket_number in state["tickets"]:
+        if BOT_MODE == "scheduler" or (BOT_MODE == "shard" and bot.get_guild(guild_id) is None):
+            # Owned by another process
+            continue
+        if bot.get_channel(channel_id) is None or not ticket_allocator.claim(guild_id, server_number, ticket_number, channel_id):
+            # Channel was deleted while the bot was offline
+            state_store.delete_ticket(channel_id)
+            continue
+        tickets += 1
+    for channel_id, guild_id in state["idle_channels"]:
+        if BOT_MODE == "scheduler" or (BOT_MODE == "shard" and bot.get_guild(guild_id) is None):
+            continue
+        info = ticket_allocator.channel_info(channel_id)
+        if info is None:
+            # The channel is gone; its ticket was dropped above
+            state_store.delete_idle_channel(channel_id)
+            continue
+        warm_pool.add(guild_id, info[1], channel_id)
+    for row in state["pending_approvals"]:
+        ticket_channel_id, guild_id, server_number, author_id, discord_username, ingame_username, hours_left, message_id = row
+        if BOT_MODE == "scheduler" or (BOT_MODE == "shard" and bot.get_guild(guild_id) is None):
+            continue
+        channel = bot.get_channel(ticket_channel_id)
+        if channel is None or ticket_allocator.channel_info(ticket_channel_id) is None:
+            state_store.delete_pending_approval(ticket_channel_id)
+            continue
+        view = TicketView(discord.Object(id=author_id), discord_username, ingame_username, hours_left, channel, server_number)
+        view.message = channel.get_partial_message(message_id)
+        pending_approvals[ticket_channel_id] = view
+        bot.add_view(view, message_id=message_id)
+    for channel_id, guild_id, opener_id, deadline, message_id in state["inactivity_deadlines"]:
+        if BOT_MODE == "scheduler" or (BOT_MODE == "shard" and bot.get_guild(guild_id) is None):
+            continue
+        channel = bot.get_channel(channel_id)
+        if channel is None or ticket_allocator.channel_info(channel_id) is None:
+            state_store.delete_inactivity_deadline(channel_id)
+            continue
+        message = channel.get_partial_message(message_id) if message_id else None
+        pending_inactivity[channel_id] = {"channel": channel, "opener_id": opener_id, "deadline": deadline, "message": message}
+        # Deadlines that passed while offline delete the ticket right away
+        schedule_inactivity_check(channel_id)
+    restored = 0
+    if BOT_MODE != "shard":
+        for guild_id, server_number, page, channel_id, message_id in state["pinned_pages"]:
+            pages = boosts_pinned_message.setdefault((guild_id, server_number), [])
+            while len(pages) <= page:
+                pages.append(None)
+            pages[page] = (channel_id, message_id)
+            remote_boosts_channels.setdefault(guild_id, channel_id)
+        for row in state["boosts"]:
+            entry = BoostEntry(*row)
+            guild = resolve_guild(entry.guild_id)
+            if guild is None or entry.ticket_channel is None:
+                state_store.delete_boost(entry.ticket_channel_id)
+                continue
+            boosts_queue.add(entry)
+            # Deadlines that passed while offline expire right away
+            boost_scheduler.schedule(entry.ticket_channel_id, entry.deadline)
+            schedule_countdown_refresh(entry)
+            request_boosts_render(guild, entry.server_number)
+            restored += 1
+        for ticket_channel_id, message_id in state["countdown_messages"]:
+            if ticket_channel_id not in boosts_queue:
+                state_store.delete_countdown_message(ticket_channel_id)
+                continue
+            ticket_countdown_messages[ticket_channel_id] = message_id
+        for ticket_channel_id, guild_id in state["dead_letters"]:
+            # Deletes that kept failing before the restart get another round of attempts
+            state_store.delete_dead_letter(ticket_channel_id)
+            expiry_pipeline.delete_channel(guild_id, ticket_channel_id)
+    print(f"Restored {restored} boost(s), {tickets} ticket(s) and {len(pending_approvals)} pending approval(s) from {state_store.path}")
+
+# --- Ticket reconciliation ---
+# The state store can miss tickets (a lost database, channels created by hand or while a write was
+# pending), so after the restore every guild's channels are scanned once and the allocator takes
+# over the numbers of psN-ticket-M channels it doesn't know yet. Problems are flagged rather than
+# fixed: ticket channels outside their psN category, numbers outside the allowed range, renamed
+# tickets, and duplicates of a number that another channel already holds.
+TICKET_CHANNEL_RE = re.compile(r"ps(\d+)-ticket-(\d+)")
+
+tickets_restored = False
+reconciled_guilds = set()
+
+def reconcile_guild(guild):
+    problems = []
+    seen = set()
+    for channel in guild.text_channels:
+        if not channel.name.startswith("ps"):
+            continue
+        match = TICKET_CHANNEL_RE.fullmatch(channel.name)
+        if match is None:
+            continue
+        server_number, ticket_number = int(match[1]), int(match[2])
+        seen.add(channel.id)
+        category = channel.category
+        if category is None or category.name != f"ps{server_number}":
+            problems.append(f"{channel.mention} is not in the ps{server_number} category")
+        known = ticket_allocator.channel_info(channel.id)
+        if known is not None:
+            if known[1:] != (server_number, ticket_number):
+                problems.append(f"{channel.mention} was renamed; it holds ps{known[1]} ticket #{known[2]}")
+            continue
+        if not 1 <= ticket_number <= TICKETS_PER_SERVER:
+            problems.append(f"{channel.mention} has a ticket number outside 1-{TICKETS_PER_SERVER}")
+            continue
+        if ticket_allocator.claim(guild.id, server_number, ticket_number, channel.id):
+            state_store.save_ticket(channel.id, guild.id, server_number, ticket_number)
+        else:
+            holder = guild.get_channel(ticket_allocator.owner(guild.id, server_number, ticket_number))
+            problems.append(f"{channel.mention} duplicates {holder.mention if holder else 'another ticket channel'}")
+    # Numbers still held by channels that were deleted while the bot couldn't see the guild
+    for channel_id in ticket_allocator.guild_channels(guild.id):
+        if channel_id not in seen and guild.get_channel(channel_id) is None:
+            release_ticket_channel(discord.Object(id=channel_id))
+    reconciled_guilds.add(guild.id)
+    return problems
+
+def ensure_reconciled(guild):
+    # Lets a command in a guild the startup pass hasn't reached yet go ahead with correct numbers
+    if tickets_restored and guild.id not in reconciled_guilds:
+        reconcile_guild(guild)
+
+async def reconcile_guilds(guilds):
+    # The scan only reads the gateway cache, so guilds take turns on the event loop rather than
+    # running in threads; the yield between guilds keeps events and commands flowing meanwhile.
+    global tickets_restored
+    tickets_restored = True
+    started = time.perf_counter()
+    flagged = 0
+    for guild in guilds:
+        problems = reconcile_guild(guild)
+        if problems:
+            flagged += len(problems)
+            print(f"Reconciliation flagged {len(problems)} problem(s) in {guild.name}: " + "; ".join(problems[:5]))
+        warm_pool.refill_soon(guild)
+        await asyncio.sleep(0)
+    print(f"Reconciled tickets in {len(guilds)} guild(s) in {time.perf_counter() - started:.2f}s, {flagged} problem(s) flagged")
 
 @bot.event
 async def on_ready():
+    global state_restored
     print(f'{bot.user} has connected to Discord!')
+    # on_ready fires again after reconnects; only rehydrate once per process
+    if not state_restored:
+        state_restored = True
+        await restore_state()
+        await reconcile_guilds(list(bot.guilds))
+        await start_metrics()
+        if BOT_MODE == "shard":
+            scheduler_link.connect()
+        # Register the /createticket slash command
+        try:
+            await bot.tree.sync()
+        except discord.HTTPException as e:
+            print(f"Failed to sync slash commands: {e}")
 
 # --- New: Find or create a category for a given server_number ---
 async def get_or_create_ps_category(guild, server_number):
     category_name = f"ps{server_number}"
-    category = discord.utils.get(guild.categories, name=category_name)
+    category = entity_cache.category(guild, category_name)
     if not category:
         # Ensure we don't exceed 50 categories
         if len(guild.categories) >= 50:
             raise Exception("Maximum number of categories reached in this server.")
         category = await guild.create_category(category_name)
+        entity_cache.remember(guild.id, "category", category_name, category.id)
     return category
 
-@bot.command(name='createticket')
-@commands.has_role(TRIAL_MOD_ROLE_NAME)
-async def createticket(ctx):
-    """Creates a ticket with step-by-step questions inside the ticket channel."""
-    guild = ctx.guild
+class TicketCreationError(Exception):
+    pass
+
+def ticket_overwrites(guild, opener):
+    overwrites = {
+        guild.default_role: discord.PermissionOverwrite(read_messages=False),
+        opener: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+    }
+    trial_mod_role = entity_cache.role(guild, TRIAL_MOD_ROLE_NAME)
+    if trial_mod_role:
+        overwrites[trial_mod_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    return overwrites
 
-    # Initialize active tickets structure for this guild if not present
-    if guild.id not in active_tickets_per_server:
-        active_tickets_per_server[guild.id] = {}
+# --- Warm ticket channel pool ---
+# Creating a channel is one of the slowest and most tightly rate-limited calls, so with
+# WARM_POOL_SIZE > 0 that many psN-ticket-M channels per guild are kept ready, hidden from everyone,
+# in the category of the ps server that new tickets go to. A ticket claims one with a single channel
+# edit (overwrites and topic), and closed tickets are hidden and emptied instead of deleted while
+# the pool has room. Pool channels hold their ticket numbers like any ticket and are listed in the
+# idle_channels table. The channel idle the longest is claimed first: Discord allows two topic
+# changes per channel per 10 minutes, and recycling leaves the topic alone.
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "0"))
+RECYCLE_PURGE_LIMIT = 200  # tickets with a longer history are deleted instead of emptied
 
-    # Find a server_number (category) with < 20 active tickets, or create new
-    server_number = 1
-    while True:
-        used_numbers = active_tickets_per_server[guild.id].get(server_number, set())
-        if len(used_numbers) < 20:
-            break
-        server_number += 1
-
-    # Enforce max 20 tickets per server_number
-    if len(active_tickets_per_server[guild.id].get(server_number, set())) >= 20:
-        await ctx.send(f"Maximum of 20 tickets reached for server ps{server_number}. Please close existing tickets before creating new ones.", delete_after=15)
-        return
+class WarmPool:
+    def __init__(self, size):
+        self.size = size if BOT_MODE != "scheduler" else 0
+        self._idle = {}  # guild_id -> {channel_id: server_number}, longest idle first
+        self._refills = {}  # guild_id -> refill task
+        self._incoming = {}  # guild_id -> channels being created or recycled for the pool
+        self._generations = {}  # channel_id -> times recycled, so views of an earlier ticket can tell
+
+    def idle_count(self, guild_id, server_number=None):
+        idle = self._idle.get(guild_id, {})
+        if server_number is None:
+            return len(idle)
+        return sum(1 for n in idle.values() if n == server_number)
+
+    def is_idle(self, channel_id, guild_id):
+        return channel_id in self._idle.get(guild_id, {})
+
+    def generation(self, channel_id):
+        return self._generations.get(channel_id, 0)
+
+    def add(self, guild_id, server_number, channel_id):
+        self._idle.setdefault(guild_id, {})[channel_id] = server_number
+
+    def discard(self, channel_id, guild_id):
+        self._generations.pop(channel_id, None)
+        if self._idle.get(guild_id, {}).pop(channel_id, None) is not None:
+            state_store.delete_idle_channel(channel_id)
+
+    def forget_guild(self, guild_id):
+        self._idle.pop(guild_id, None)
+        self._incoming.pop(guild_id, None)
+        task = self._refills.pop(guild_id, None)
+        if task:
+            task.cancel()
+
+    @staticmethod
+    def hidden_overwrites(guild):
+        return {guild.default_role: discord.PermissionOverwrite(read_messages=False)}
+
+    async def claim(self, guild, opener):
+        # Returns (ticket_channel, server_number), or None when no channel is ready
+        idle = self._idle.get(guild.id)
+        while idle:
+            server_number = min(idle.values())
+            channel_id = next(c for c, n in idle.items() if n == server_number)
+            del idle[channel_id]
+            state_store.delete_idle_channel(channel_id)
+            channel = guild.get_channel(channel_id)
+            info = ticket_allocator.channel_info(channel_id)
+            if channel is None or info is None:
+                continue
+            try:
+                await channel.edit(overwrites=ticket_overwrites(guild, opener), topic=f"Ticket #{info[2]} opened by {opener}")
+            except discord.HTTPException as e:
+                print(f"Failed to claim {channel} from the warm pool: {e}")
+                self.add(guild.id, server_number, channel_id)
+                state_store.save_idle_channel(channel_id, guild.id)
+                return None
+            self.refill_soon(guild)
+            return channel, server_number
+        self.refill_soon(guild)
+        return None
+
+    def wants(self, guild_id, channel_id):
+        info = ticket_allocator.channel_info(channel_id)
+        return self.size > 0 and info is not None and self._room(guild_id)
+
+    def _room(self, guild_id):
+        return self.idle_count(guild_id) + self._incoming.get(guild_id, 0) < self.size
+
+    async def recycle(self, channel):
+        # Hides and empties a closed ticket channel; returns False if it should be deleted instead
+        guild = channel.guild
+        info = ticket_allocator.channel_info(channel.id)
+        cancel_inactivity_timer(channel.id)
+        forget_pending_approval(channel.id)
+        self._generations[channel.id] = self.generation(channel.id) + 1
+        self._incoming[guild.id] = self._incoming.get(guild.id, 0) + 1
+        try:
+            await outbound.call(
+                guild.id, "channel.edit", channel.id,
+                lambda: channel.edit(overwrites=self.hidden_overwrites(guild)), PRIORITY_CRITICAL
+            )
+            deleted = await outbound.call(
+                guild.id, "message.purge", channel.id, lambda: channel.purge(limit=RECYCLE_PURGE_LIMIT), PRIORITY_CRITICAL
+            )
+        finally:
+            self._incoming[guild.id] -= 1
+        if len(deleted) >= RECYCLE_PURGE_LIMIT:
+            return False
+        self.add(guild.id, info[1], channel.id)
+        state_store.save_idle_channel(channel.id, guild.id)
+        return True
+
+    def refill_soon(self, guild):
+        if self.size <= 0:
+            return
+        task = self._refills.get(guild.id)
+        if task is None or task.done():
+            self._refills[guild.id] = asyncio.create_task(self._refill(guild))
+
+    async def _refill(self, guild):
+        # One channel at a time, so a refill never competes with tickets being opened
+        while self._room(guild.id):
+            server_number, ticket_number = ticket_allocator.reserve(guild.id)
+            self._incoming[guild.id] = self._incoming.get(guild.id, 0) + 1
+            try:
+                async with ticket_allocator.lock(guild.id):
+                    category = await get_or_create_ps_category(guild, server_number)
+                channel = await guild.create_text_channel(
+                    name=f"ps{server_number}-ticket-{ticket_number}",
+                    overwrites=self.hidden_overwrites(guild),
+                    category=category
+                )
+            except Exception as e:
+                ticket_allocator.rollback(guild.id, server_number, ticket_number)
+                print(f"Failed to add a channel to the warm pool of {guild.name}: {e}")
+                return
+            finally:
+                self._incoming[guild.id] -= 1
+            ticket_allocator.commit(guild.id, server_number, ticket_number, channel.id)
+            state_store.save_ticket(channel.id, guild.id, server_number, ticket_number)
+            self.add(guild.id, server_number, channel.id)
+            state_store.save_idle_channel(channel.id, guild.id)
+
+warm_pool = WarmPool(WARM_POOL_SIZE)
+
+async def dispose_ticket_channel(guild_id, channel):
+    # Gets rid of a closed ticket channel: back into the warm pool when it has room, otherwise
+    # deleted. Returns True if the channel was recycled (and keeps its ticket number).
+    if warm_pool.wants(guild_id, channel.id):
+        try:
+            if await warm_pool.recycle(channel):
+                return True
+        except discord.HTTPException as e:
+            print(f"Failed to recycle {channel}, deleting it instead: {e}")
+    await outbound.call(guild_id, "channel.delete", guild_id, channel.delete, PRIORITY_CRITICAL)
+    return False
+
+async def open_ticket_channel(guild, opener):
+    # Claims a warm channel, or reserves a ticket number and creates the psX-ticket-# channel for it.
+    # Returns (ticket_channel, server_number); raises TicketCreationError with a user-facing message.
+
+    if not tickets_restored:
+        raise TicketCreationError("The bot is still starting up, please try again in a few seconds.")
+    ensure_reconciled(guild)
+
+    claimed = await warm_pool.claim(guild, opener)
+    if claimed:
+        return claimed
+
+    # Reserve the lowest free ticket number on the first ps server (category) with < 20 tickets
+    server_number, ticket_number = ticket_allocator.reserve(guild.id)
 
-    # Find the lowest available ticket number for this server_number
-    used_numbers = active_tickets_per_server[guild.id].get(server_number, set())
-    # Ticket numbers are 1-based
-    for ticket_number in range(1, 21):
-        if ticket_number not in used_numbers:
-            break
-    # Reserve the ticket number now
-    if server_number not in active_tickets_per_server[guild.id]:
-        active_tickets_per_server[guild.id][server_number] = set()
-    active_tickets_per_server[guild.id][server_number].add(ticket_number)
-
-    # Create or get the correct category for this server_number
+    # Create or get the correct category for this server_number. Serialized per guild so two
+    # tickets reserving on a new server don't both create the category.
     try:
-        category = await get_or_create_ps_category(guild, server_number)
+        async with ticket_allocator.lock(guild.id):
+            category = await get_or_create_ps_category(guild, server_number)
     except Exception as e:
         # Release the ticket number reservation
-        active_tickets_per_server[guild.id][server_number].discard(ticket_number)
-        await ctx.send(str(e), delete_after=10)
-        return
+        ticket_allocator.rollback(guild.id, server_number, ticket_number)
+        raise TicketCreationError(str(e))
 
     # Set channel permissions for the ticket channel
-    overwrites = {
-        guild.default_role: discord.PermissionOverwrite(read_messages=False),
-        ctx.author: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-    }
-    trial_mod_role = discord.utils.get(guild.roles, name=TRIAL_MOD_ROLE_NAME)
-    if trial_mod_role:
-        overwrites[trial_mod_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    overwrites = ticket_overwrites(guild, opener)
 
     channel_name = f"ps{server_number}-ticket-{ticket_number}"
     try:
         ticket_channel = await guild.create_text_channel(
             name=channel_name,
             overwrites=overwrites,
-            topic=f"Ticket #{ticket_number} opened by {ctx.author}",
+            topic=f"Ticket #{ticket_number} opened by {opener}",
             category=category
         )
     except discord.HTTPException as e:
         # Release the ticket number reservation
-        active_tickets_per_server[guild.id][server_number].discard(ticket_number)
-        await ctx.send(f"Failed to create ticket channel: {e}", delete_after=10)
-        return
+        ticket_allocator.rollback(guild.id, server_number, ticket_number)
+        raise TicketCreationError(f"Failed to create ticket channel: {e}")
 
-    def check_author(m):
-        return m.author == ctx.author and m.channel == ticket_channel
+    # The number now belongs to the channel and is freed when the channel is deleted
+    ticket_allocator.commit(guild.id, server_number, ticket_number, ticket_channel.id)
+    state_store.save_ticket(ticket_channel.id, guild.id, server_number, ticket_number)
+    return ticket_channel, server_number
 
-    await ctx.send(f"{ctx.author.mention}, your ticket has been created: {ticket_channel.mention}", delete_after=10)
+async def post_ticket_summary(ticket_channel, opener, discord_username, ingame_username, hours_left, server_number):
+    view = TicketView(opener, discord_username, ingame_username, hours_left, ticket_channel, server_number)
+    view.message = await ticket_channel.send(
+        f"Ticket opened by {opener.mention}\n"
+        f"**Discord Username:** {discord_username}\n"
+        f"**Username (not display name):** {ingame_username}\n"
+        f"**Hours Remaining:** {hours_left}",
+        view=view
+    )
+    pending_approvals[ticket_channel.id] = view
+    state_store.save_pending_approval(view)
 
-    # --- Start deletion countdown if user does not reply ---
-    deletion_task = asyncio.create_task(ticket_deletion_countdown(ticket_channel, ctx.author.id))
-    ticket_deletion_tasks[ticket_channel.id] = (deletion_task, ctx.author.id)
+# --- Ticket intake form ---
+# All three ticket fields are collected and validated in one modal submission, so there are no
+# pending bot.wait_for checks running against every message the bot sees.
+class TicketIntakeModal(discord.ui.Modal, title="Ticket details"):
+    discord_username = discord.ui.TextInput(label="Discord username", max_length=100)
+    ingame_username = discord.ui.TextInput(label="Username (not display name)", max_length=100)
+    hours_left = discord.ui.TextInput(label="Hours remaining (integer only)", max_length=6)
 
-    # --- Listen for messages from the ticket opener to cancel deletion countdown ---
-    def user_message_check(m):
-        return m.channel == ticket_channel and m.author.id == ctx.author.id
+    def __init__(self, ticket_channel=None, server_number=None, intake_view=None):
+        # In a ticket channel the form only holds off the inactivity timer for TICKET_FORM_TIMEOUT
+        super().__init__(timeout=TICKET_FORM_TIMEOUT if ticket_channel is not None else None)
+        # Without a ticket channel (slash command) the channel is opened once the form is submitted
+        self.ticket_channel = ticket_channel
+        self.server_number = server_number
+        self.intake_view = intake_view
 
-    # Start a task to listen for the user's first message
-    async def listen_for_opener_response():
+    async def on_submit(self, interaction: discord.Interaction):
+        if self.intake_view and self.intake_view.done:
+            await interaction.response.send_message("The ticket details were already submitted.", ephemeral=True)
+            return
+        if self.ticket_channel is not None and (
+            bot.get_channel(self.ticket_channel.id) is None
+            or (self.intake_view and warm_pool.generation(self.ticket_channel.id) != self.intake_view.generation)
+        ):
+            # Closed while the form was open: the channel is gone or back in the warm pool
+            await interaction.response.send_message("This ticket was closed. Please open a new one.", ephemeral=True)
+            return
+        discord_username = self.discord_username.value.strip()
+        ingame_username = self.ingame_username.value.strip()
         try:
-            await bot.wait_for('message', check=user_message_check, timeout=60)
-            # User responded, cancel deletion countdown if still running
-            task_info = ticket_deletion_tasks.get(ticket_channel.id)
-            if task_info:
-                task, _ = task_info
-                if not task.done():
-                    task.cancel()
-                del ticket_deletion_tasks[ticket_channel.id]
-                try:
-                    await ticket_channel.send("Ticket inactivity countdown cancelled. Please continue with the ticket process.")
-                except Exception:
-                    pass
-        except asyncio.TimeoutError:
-            # No response in 60 seconds, channel will be deleted by countdown
-            pass
-    asyncio.create_task(listen_for_opener_response())
+            hours_left_int = int(self.hours_left.value.strip())
+            if hours_left_int <= 0:
+                raise ValueError
+        except ValueError:
+            await interaction.response.send_message("Hours remaining must be a positive integer. Please fill in the form again.", ephemeral=True)
+            return
+        hours_left = str(hours_left_int)
+        if self.intake_view:
+            # Claimed before the first await, so a second submit can't get past the check above
+            self.intake_view.done = True
 
-    try:
-        await ticket_channel.send(f"{ctx.author.mention}, Enter Discord username:")
-        discord_username_msg = await bot.wait_for('message', check=check_author, timeout=300)
-        discord_username = discord_username_msg.content.strip()
-
-        await ticket_channel.send("Enter username (not display name):")
-        ingame_username_msg = await bot.wait_for('message', check=check_author, timeout=300)
-        ingame_username = ingame_username_msg.content.strip()
-
-        # Validate hours remaining input as integer, ask repeatedly if invalid
-        hours_left = None
-        while hours_left is None:
-            await ticket_channel.send("Enter hours remaining (integer only):")
+        if self.ticket_channel is None:
+            await interaction.response.defer(ephemeral=True, thinking=True)
             try:
-                hours_left_msg = await bot.wait_for('message', check=check_author, timeout=300)
-                hours_left_input = hours_left_msg.content.strip()
-                hours_left_int = int(hours_left_input)
-                if hours_left_int <= 0:
-                    await ticket_channel.send("Please enter a positive integer for hours remaining.")
-                    continue
-                hours_left = str(hours_left_int)
-            except ValueError:
-                await ticket_channel.send("Invalid input. Please enter an integer number for hours remaining.")
-            except asyncio.TimeoutError:
-                await ticket_channel.send("You took too long to respond. Please run the command again.")
-                # Release the ticket number reservation
-                active_tickets_per_server[guild.id][server_number].discard(ticket_number)
+                ticket_channel, server_number = await open_ticket_channel(interaction.guild, interaction.user)
+            except TicketCreationError as e:
+                await interaction.followup.send(str(e), ephemeral=True)
                 return
+            await post_ticket_summary(ticket_channel, interaction.user, discord_username, ingame_username, hours_left, server_number)
+            await interaction.followup.send(f"Your ticket has been created: {ticket_channel.mention}", ephemeral=True)
+            return
 
-    except asyncio.TimeoutError:
-        await ticket_channel.send("You took too long to respond. Please run the command again.")
-        # Release the ticket number reservation
-        active_tickets_per_server[guild.id][server_number].discard(ticket_number)
+        # The opener answered, so the inactivity countdown no longer applies
+        cancel_inactivity_timer(self.ticket_channel.id)
+        await interaction.response.send_message("Ticket details received.", ephemeral=True)
+        if self.intake_view:
+            await self.intake_view.complete()
+        await post_ticket_summary(self.ticket_channel, interaction.user, discord_username, ingame_username, hours_left, self.server_number)
+
+class TicketIntakeView(discord.ui.View):
+    def __init__(self, opener, ticket_channel, server_number):
+        super().__init__(timeout=TICKET_FORM_TIMEOUT)
+        self.opener = opener
+        self.ticket_channel = ticket_channel
+        self.server_number = server_number
+        self.generation = warm_pool.generation(ticket_channel.id)
+        self.message = None
+        self.done = False
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id == self.opener.id:
+            return True
+        await interaction.response.send_message("Only the ticket opener can fill in the ticket details.", ephemeral=True)
+        return False
+
+    @discord.ui.button(label="Fill in ticket details", style=discord.ButtonStyle.primary)
+    async def fill_in(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(TicketIntakeModal(self.ticket_channel, self.server_number, self))
+        # The opener is answering; don't delete the channel while they type
+        await extend_inactivity_timer(self.ticket_channel.id, TICKET_FORM_TIMEOUT)
+
+    async def complete(self):
+        self.done = True
+        self.stop()
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+    async def on_timeout(self):
+        if self.done or warm_pool.generation(self.ticket_channel.id) != self.generation:
+            # Answered, or the ticket was closed and its channel went back to the warm pool
+            return
+        await self.complete()
+        try:
+            await self.ticket_channel.send("You took too long to respond. Please run the command again.")
+        except discord.HTTPException:
+            pass
+
+# --- Bulk moderator operations ---
+# Bulk commands update the queues and indexes in one pass first; every changed server is only
+# marked dirty, so the pinned list is rendered once per server. The REST calls that follow
+# (channel deletes, countdown messages) run with at most BULK_CONCURRENCY in flight and are paced by
+# the outbound dispatcher.
+BULK_CONCURRENCY = 5
+
+async def gather_bounded(calls, limit=BULK_CONCURRENCY):
+    # Runs zero-argument coroutine functions with at most `limit` at a time; exceptions are returned in place
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(run(call) for call in calls), return_exceptions=True)
+
+async def close_tickets(guild, channels):
+    # Returns the number of channels deleted or recycled
+    for channel in channels:
+        close_boost(channel.id, guild)
+        cancel_inactivity_timer(channel.id)
+        forget_pending_approval(channel.id)
+    results = await gather_bounded(
+        lambda channel=channel: dispose_ticket_channel(guild.id, channel)
+        for channel in channels
+    )
+    closed = 0
+    for channel, result in zip(channels, results):
+        if isinstance(result, Exception) and not isinstance(result, discord.NotFound):
+            print(f"Failed to delete {channel}: {result}")
+            continue
+        if result is not True:
+            release_ticket_channel(channel)
+        closed += 1
+    return closed
+
+async def approve_tickets(guild, views, boosts_channel):
+    # Returns (approved views, views rejected for invalid hours)
+    approved, invalid = [], []
+    for view in views:
+        (approved if view.valid_hours() and view.open_for_approval() else invalid).append(view)
+
+    async def approve(view):
+        await view.accept(guild, boosts_channel)
+        view.clear_items()
+        if view.message is not None:
+            await outbound.call(guild.id, "message.edit", view.ticket_channel_id, lambda: view.message.edit(view=view))
+
+    results = await gather_bounded(lambda view=view: approve(view) for view in approved)
+    for view, result in zip(approved, results):
+        if isinstance(result, Exception) and not isinstance(result, TicketClosedError):
+            print(f"Failed to approve ticket channel {view.ticket_channel_id}: {result}")
+    # A ticket closed while it was being approved doesn't count as approved
+    approved = [view for view, result in zip(approved, results) if not isinstance(result, TicketClosedError)]
+    return approved, invalid
+
+# -- Hooks: count and time every prefix command that passed its checks --
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.metrics_started = time.perf_counter()
+
+@bot.after_invoke
+async def record_command(ctx):
+    outcome = "error" if ctx.command_failed else "ok"
+    record_action("command", ctx.command.qualified_name, outcome, time.perf_counter() - ctx.metrics_started)
+
+@bot.command(name='createticket')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def createticket(ctx):
+    """Creates a ticket channel with a form for the ticket details."""
+    try:
+        ticket_channel, server_number = await open_ticket_channel(ctx.guild, ctx.author)
+    except TicketCreationError as e:
+        await ctx.send(str(e), delete_after=10)
         return
 
-    await ticket_channel.send(
-        f"Ticket opened by {ctx.author.mention}\n"
-        f"**Discord Username:** {discord_username}\n"
-        f"**Username (not display name):** {ingame_username}\n"
-        f"**Hours Remaining:** {hours_left}",
-        view=TicketView(ctx.author, discord_username, ingame_username, hours_left, ticket_channel, server_number)
+    await ctx.send(f"{ctx.author.mention}, your ticket has been created: {ticket_channel.mention}", delete_after=10)
+
+    # --- Start deletion countdown if user does not reply (cancelled from on_message or the form) ---
+    await start_inactivity_timer(ticket_channel, ctx.author.id)
+
+    intake_view = TicketIntakeView(ctx.author, ticket_channel, server_number)
+    intake_view.message = await ticket_channel.send(
+        f"{ctx.author.mention}, press the button below to enter the Discord username, username (not display name) and hours remaining.",
+        view=intake_view
     )
 
-    # Attach ticket number info to channel for deletion cleanup
-    # Instead of setting attributes (which is not allowed), store info in a global dict
-    if "ticket_channel_info" not in globals():
-        global ticket_channel_info
-        ticket_channel_info = {}
-    ticket_channel_info[ticket_channel.id] = {"server_number": server_number, "ticket_number": ticket_number}
+@bot.tree.command(name="createticket", description="Create a ticket by filling in the ticket details.")
+@app_commands.guild_only()
+@app_commands.checks.has_role(TRIAL_MOD_ROLE_NAME)
+@instrumented("slash", "createticket")
+async def createticket_slash(interaction: discord.Interaction):
+    await interaction.response.send_modal(TicketIntakeModal())
+
+@createticket_slash.error
+async def createticket_slash_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.MissingRole):
+        await interaction.response.send_message("You do not have permission to use this.", ephemeral=True)
+        return
+    raise error
 
 @bot.command(name='close')
 @commands.has_role(TRIAL_MOD_ROLE_NAME)
 async def close(ctx):
-    # Before deleting, free up the ticket number if this is a psX-ticket-# channel
     channel = ctx.channel
     guild = ctx.guild
-    server_number = None
-    ticket_number = None
-    # Try to extract from name
-    import re
-    match = re.match(r"ps(\d+)-ticket-(\d+)", channel.name)
-    if match:
-        server_number = int(match.group(1))
-        ticket_number = int(match.group(2))
-    # Or from global ticket_channel_info (if present)
-    if "ticket_channel_info" in globals() and channel.id in ticket_channel_info:
-        info = ticket_channel_info[channel.id]
-        server_number = info.get("server_number", server_number)
-        ticket_number = info.get("ticket_number", ticket_number)
-    # Remove from active_tickets_per_server
-    if guild and server_number and ticket_number:
-        if guild.id in active_tickets_per_server and server_number in active_tickets_per_server[guild.id]:
-            active_tickets_per_server[guild.id][server_number].discard(ticket_number)
+    # Stop the boost timer for this ticket, if any
+    close_boost(channel.id, guild)
     await ctx.send("This ticket will be closed in 5 seconds...")
     await asyncio.sleep(5)
-    await channel.delete()
+    if await dispose_ticket_channel(guild.id, channel):
+        return
+    # Free the ticket number (on_guild_channel_delete does the same; releasing twice is harmless)
+    release_ticket_channel(channel)
+
+@bot.command(name='extend')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def extend(ctx, hours: int):
+    """Adds hours to the running boost of this ticket channel."""
+    if hours <= 0:
+        await ctx.send("Hours must be a positive integer.", delete_after=10)
+        return
+    try:
+        deadline = await extend_boost_by(ctx.channel.id, ctx.guild, hours * 3600)
+    except SchedulerUnavailable as e:
+        await ctx.send(str(e), delete_after=30)
+        return
+    if deadline is None:
+        await ctx.send("There is no active boost for this ticket.", delete_after=10)
+        return
+    await ctx.send(f"Boost extended by {hours} hour(s). New time remaining: **{seconds_to_hhmmss(max(0, int(deadline - now())))}**")
+
+@bot.command(name='closeall')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def closeall(ctx, server_number: int, scope: str = "idle"):
+    """Closes the tickets in psN without a running boost, or every ticket with 'all'."""
+    if scope not in ("idle", "all"):
+        await ctx.send("Usage: !closeall <server number> [idle|all]", delete_after=10)
+        return
+    channel_ids = [
+        channel_id for channel_id in ticket_allocator.channels(ctx.guild.id, server_number)
+        if not warm_pool.is_idle(channel_id, ctx.guild.id)
+    ]
+    if scope == "idle":
+        try:
+            boosted = await server_boosts(ctx.guild, server_number)
+        except SchedulerUnavailable as e:
+            await ctx.send(str(e), delete_after=30)
+            return
+        channel_ids = [channel_id for channel_id in channel_ids if channel_id not in boosted]
+    channels = [channel for channel in map(ctx.guild.get_channel, channel_ids) if channel is not None and channel != ctx.channel]
+    if not channels:
+        await ctx.send(f"No tickets to close in ps{server_number}.")
+        return
+    await ctx.send(f"Closing {len(channels)} ticket(s) in ps{server_number}...")
+    closed = await close_tickets(ctx.guild, channels)
+    await ctx.send(f"Closed {closed} ticket(s) in ps{server_number}.")
+
+@bot.command(name='extendall')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def extendall(ctx, server_number: int, hours: int):
+    """Adds hours to every running boost in psN."""
+    if hours <= 0:
+        await ctx.send("Hours must be a positive integer.", delete_after=10)
+        return
+    try:
+        extended = await extend_all_boosts(ctx.guild, server_number, hours * 3600)
+    except SchedulerUnavailable as e:
+        await ctx.send(str(e), delete_after=30)
+        return
+    await ctx.send(f"Extended {extended} boost(s) in ps{server_number} by {hours} hour(s).")
+
+@bot.command(name='approveall')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def approveall(ctx, server_number: Optional[int] = None, *channels: discord.TextChannel):
+    """Approves the tickets waiting for approval in psN, or the mentioned ticket channels."""
+    if server_number is None and not channels:
+        await ctx.send("Usage: !approveall <server number> or !approveall #ticket ...", delete_after=10)
+        return
+    boosts_channel = entity_cache.text_channel(ctx.guild, BOOSTS_CHANNEL_NAME)
+    if boosts_channel is None:
+        await ctx.send(f"Boosts channel '{BOOSTS_CHANNEL_NAME}' not found.", delete_after=10)
+        return
+    if channels:
+        views = [pending_approvals[channel.id] for channel in channels if channel.id in pending_approvals]
+    else:
+        views = [
+            view for view in pending_approvals.values()
+            if view.guild_id == ctx.guild.id and view.server_number == server_number
+        ]
+    if not views:
+        await ctx.send("No tickets waiting for approval.")
+        return
+    approved, invalid = await approve_tickets(ctx.guild, views, boosts_channel)
+    lines = [f"Approved {len(approved)} ticket(s)."]
+    if invalid:
+        lines.append("Skipped (invalid hours or already handled): " + ", ".join(f"<#{view.ticket_channel_id}>" for view in invalid))
+    await ctx.send("\n".join(lines))
+
+@bot.command(name='capacity')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def capacity(ctx):
+    """Shows ticket slot occupancy per ps server."""
+    occupancy = ticket_allocator.capacity(ctx.guild.id)
+    if not occupancy:
+        await ctx.send("No ticket slots in use.")
+        return
+    lines = []
+    for server_number, (used, total) in occupancy.items():
+        warm = warm_pool.idle_count(ctx.guild.id, server_number)
+        lines.append(f"ps{server_number}: {used - warm}/{total}" + (f" (+{warm} warm)" if warm else ""))
+    await ctx.send("\n".join(lines))
+
+@bot.command(name='reconcile')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def reconcile(ctx):
+    """Scans the ticket channels again and lists orphaned or duplicate tickets."""
+    problems = reconcile_guild(ctx.guild)
+    if not problems:
+        await ctx.send("Ticket numbers match the ticket channels; nothing to report.")
+        return
+    lines = [f"Found {len(problems)} problem(s):"] + [f"- {problem}" for problem in problems]
+    text = ""
+    for line in lines:
+        if len(text) + len(line) + 1 > 2000:
+            await ctx.send(text)
+            text = ""
+        text += line + "\n"
+    await ctx.send(text)
+
+@bot.command(name='setinactivity')
+@commands.has_permissions(manage_guild=True)
+async def setinactivity(ctx, seconds: int):
+    """Sets how long a new ticket waits for the opener's first reply before it is deleted."""
+    if seconds < 10:
+        await ctx.send("The inactivity timeout must be at least 10 seconds.", delete_after=10)
+        return
+    inactivity_timeouts[ctx.guild.id] = seconds
+    state_store.save_inactivity_timeout(ctx.guild.id, seconds)
+    await ctx.send(f"New tickets will now be deleted after {seconds} seconds without a reply from the ticket opener.")
+
+@bot.command(name='outbound')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def outbound_stats(ctx):
+    """Shows the outbound REST queue depth per priority class."""
+    depth = outbound.depth()
+    guild_depth = outbound.depth(ctx.guild.id)
+    lines = [f"{name}: {depth[name]} queued ({guild_depth[name]} for this server)" for name in PRIORITY_NAMES]
+    lines.append(f"parked cosmetic edits: {depth['parked']}")
+    lines.append(f"merged: {outbound.merged} | dropped: {outbound.dropped}")
+    await ctx.send("\n".join(lines))
+
+@bot.command(name='botstats')
+@commands.has_role(TRIAL_MOD_ROLE_NAME)
+async def botstats(ctx):
+    """Shows handler timings, REST traffic, event loop lag and queue sizes."""
+    lines = ["**Handlers** (count | mean | p95)"]
+    for kind, name in sorted({labels[:2] for labels in action_calls.values}):
+        count, mean, p95 = action_seconds.summary(kind, name)
+        errors = action_calls.values.get((kind, name, "error"), 0)
+        lines.append(f"{kind} {name}: {count} | {mean * 1000:.1f} ms | ≤{p95 * 1000:.0f} ms" + (f" | {errors} failed" if errors else ""))
+    renders = render_calls.values
+    lines.append(
+        f"**Pinned renders:** {renders.get(('rendered',), 0)} rendered, {renders.get(('unchanged',), 0)} unchanged, "
+        f"{renders.get(('failed',), 0) + renders.get(('rate_limited',), 0)} failed"
+    )
+    by_route = {}
+    for (method, route, status), count in api_calls.values.items():
+        by_route[f"{method} {route}"] = by_route.get(f"{method} {route}", 0) + count
+    busiest = sorted(by_route.items(), key=lambda item: -item[1])[:5]
+    lines.append(f"**REST requests:** {api_calls.total()} ({api_rate_limited.total()} rate limited)")
+    lines.extend(f"  {route}: {count}" for route, count in busiest)
+    count, mean, p95 = loop_lag.summary()
+    lines.append(f"**Event loop lag:** last {last_loop_lag * 1000:.1f} ms | mean {mean * 1000:.1f} ms | p95 ≤{p95 * 1000:.0f} ms")
+    deletes = expiry_deletes.values
+    lines.append(
+        f"**Expiry cleanup:** {expiry_pipeline.pending()} pending, {deletes.get(('deleted',), 0)} channels deleted, "
+        f"{deletes.get(('retried',), 0)} retries, {expiry_pipeline.dead_letters} dead-lettered"
+    )
+    if BOT_MODE == "shard":
+        lines.append(f"**Scheduler link:** {scheduler_link.backlog()} events waiting, {scheduler_link.dropped} hints dropped")
+    timers = collect_timers()
+    lines.append("**Timers:** " + ", ".join(f"{name}: {n}" for (name,), n in timers.items()) + f" | tasks: {len(asyncio.all_tasks())}")
+    occupancy = ticket_allocator.capacity(ctx.guild.id)
+    servers = [
+        f"ps{server_number}: {boosts_queue.count(ctx.guild.id, server_number)} boosts, "
+        f"{used - warm_pool.idle_count(ctx.guild.id, server_number)}/{total} slots"
+        for server_number, (used, total) in occupancy.items()
+    ]
+    lines.append("**Servers:** " + ("; ".join(servers) if servers else "no tickets"))
+    await ctx.send("\n".join(lines))
 
 @bot.event
 async def on_message(message):
     # Listen for ticket opener's message to cancel deletion countdown if needed
-    if message.guild and message.channel and message.channel.id in ticket_deletion_tasks:
-        task, author_id = ticket_deletion_tasks[message.channel.id]
-        if message.author.id == author_id:
-            if not task.done():
-                task.cancel()
-            del ticket_deletion_tasks[message.channel.id]
+    info = pending_inactivity.get(message.channel.id) if message.guild else None
+    if info and not message.author.bot:
+        if message.author.id == info["opener_id"]:
+            cancel_inactivity_timer(message.channel.id)
             try:
                 await message.channel.send("Ticket inactivity countdown cancelled. Please continue with the ticket process.")
             except Exception:
                 pass
+        else:
+            await extend_inactivity_timer(message.channel.id)
     await bot.process_commands(message)
 
 
-# -- Hook: Remove ticket number from active_tickets_per_server when channel deleted (for any reason) --
+def release_ticket_channel(channel):
+    # Frees the channel's ticket number. The allocator knows which channel owns each number, so a
+    # channel that merely looks like psX-ticket-# can't free someone else's slot.
+    forget_pending_approval(channel.id)
+    info = ticket_allocator.release_channel(channel.id)
+    if info:
+        warm_pool.discard(channel.id, info[0])
+        state_store.delete_ticket(channel.id)
+
+# -- Hook: Remove ticket number from the allocator when channel deleted (for any reason) --
 @bot.event
 async def on_guild_channel_delete(channel):
+    kind = channel_kind(channel)
+    if kind:
+        entity_cache.invalidate(channel.guild.id, kind, channel.name)
     # Only process text channels
     if not isinstance(channel, discord.TextChannel):
         return
-    # Check if channel name matches psX-ticket-#
-    import re
-    match = re.match(r"ps(\d+)-ticket-(\d+)", channel.name)
-    server_number = None
-    ticket_number = None
-    if match:
-        server_number = int(match.group(1))
-        ticket_number = int(match.group(2))
-    # Or from global ticket_channel_info
-    if "ticket_channel_info" in globals() and channel.id in ticket_channel_info:
-        info = ticket_channel_info[channel.id]
-        server_number = info.get("server_number", server_number)
-        ticket_number = info.get("ticket_number", ticket_number)
-        del ticket_channel_info[channel.id]
-    if server_number is None or ticket_number is None:
-        return
-    guild = channel.guild
-    if guild and guild.id in active_tickets_per_server and server_number in active_tickets_per_server[guild.id]:
-        active_tickets_per_server[guild.id][server_number].discard(ticket_number)
+    cancel_inactivity_timer(channel.id)
+    release_ticket_channel(channel)
 
-if TOKEN:
-    bot.run(TOKEN)
-else:
-    print("Error: DISCORD_BOT_TOKEN environment variable not set.")
\ No newline at end of file
+# -- Hooks: keep the member lookup index in sync --
+@bot.event
+async def on_member_join(member):
+    member_index.add(member)
+
+@bot.event
+async def on_member_update(before, after):
+    member_index.add(after)
+
+@bot.event
+async def on_user_update(before, after):
+    # Username and global name changes arrive once per user, not per guild
+    for guild in after.mutual_guilds:
+        member = guild.get_member(after.id)
+        if member:
+            member_index.add(member)
+
+@bot.event
+async def on_member_remove(member):
+    member_index.remove(member)
+
+# -- Hooks: reconcile guilds that (re)appear after startup --
+@bot.event
+async def on_guild_available(guild):
+    # Also fires for every guild before on_ready; those are handled by the startup pass
+    if tickets_restored:
+        reconcile_guild(guild)
+
+@bot.event
+async def on_guild_join(guild):
+    if tickets_restored:
+        reconcile_guild(guild)
+        warm_pool.refill_soon(guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    warm_pool.forget_guild(guild.id)
+    member_index.forget_guild(guild.id)
+    entity_cache.forget_guild(guild.id)
+    reconciled_guilds.discard(guild.id)
+
+# -- Hook: recreate a pinned boosts list that was deleted by hand --
+@bot.event
+async def on_raw_message_delete(payload):
+    # Only deletions in the boosts channel can touch a pinned page; everything else is chat
+    guild = bot.get_guild(payload.guild_id) if payload.guild_id is not None else None
+    boosts_channel = boosts_channel_for(guild) if guild is not None else None
+    if boosts_channel is not None and payload.channel_id == boosts_channel.id:
+        forget_pinned_message(payload.guild_id, payload.message_id)
+
+# -- Hooks: invalidate cached channel, category and role IDs --
+@bot.event
+async def on_guild_channel_create(channel):
+    kind = channel_kind(channel)
+    if kind:
+        entity_cache.invalidate(channel.guild.id, kind, channel.name)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    kind = channel_kind(after)
+    if kind and before.name != after.name:
+        entity_cache.invalidate(after.guild.id, kind, before.name, after.name)
+
+@bot.event
+async def on_guild_role_create(role):
+    entity_cache.invalidate(role.guild.id, "role", role.name)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.name != after.name:
+        entity_cache.invalidate(after.guild.id, "role", before.name, after.name)
+
+@bot.event
+async def on_guild_role_delete(role):
+    entity_cache.invalidate(role.guild.id, "role", role.name)
+
+def stop_on_sigterm(signum, frame):
+    # docker stop and systemd send SIGTERM; shut down the same way as on Ctrl+C
+    raise KeyboardInterrupt
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    try:
+        if not TOKEN:
+            print("Error: DISCORD_BOT_TOKEN environment variable not set.")
+        elif BOT_MODE == "scheduler":
+            asyncio.run(run_scheduler_worker())
+        else:
+            bot.run(TOKEN)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # An approval or expiry right before the shutdown is still waiting for its group commit
+        state_store.close()